@@ -0,0 +1,187 @@
+"""Benchmark /api/songs_weighted and /api/songs_bands end to end.
+
+Run from the project root:
+
+    python -m benchmarks.endpoints --sizes 10000 100000 1000000 --output bench.json
+
+For every size a synthetic catalog is loaded into an SQLite stand-in
+database and published as a catalog snapshot. A child process then starts
+the app on that snapshot, so MySQL is never needed. The child drives both
+endpoints through Flask's test client and over real HTTP. It reports
+latency percentiles and throughput separately for new searches (ranking)
+and for page-N requests of a search already run (cache slices), plus
+catalog load time and peak RSS.
+
+Results are written as JSON tagged with the current commit so runs can be
+compared across commits.
+"""
+import argparse
+import http.client
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from . import synthetic
+
+PAGES = 10
+
+
+def _summary(latencies, wall_seconds):
+    latencies = np.array(latencies)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'mean_ms': round(latencies.mean(), 3),
+        'throughput_rps': round(len(latencies) / wall_seconds, 1),
+    }
+
+
+def _request_bodies(data, count):
+    """(endpoint, body) pairs for new searches, one per distinct query"""
+    bodies = []
+    for weights in synthetic.random_weighted_queries(data, count):
+        bodies.append(('/api/songs_weighted',
+                       {'genres': [{'genre': g, 'weight': w} for g, w in weights], 'totalRequested': 500}))
+    for bands in synthetic.random_band_queries(data, count):
+        bodies.append(('/api/songs_bands',
+                       {'genres': [{'band': f'band {i}', 'genres': genres} for i, genres in enumerate(bands)],
+                        'totalRequested': 500}))
+    return bodies
+
+
+def _run(post, bodies, concurrency):
+    """Send new searches, then pages 2..PAGES of each; returns per-kind summaries"""
+    results = {}
+    for endpoint in ('/api/songs_weighted', '/api/songs_bands'):
+        searches = [body for path, body in bodies if path == endpoint]
+        pages = [dict(body, page=page) for body in searches for page in range(2, PAGES + 1)]
+        name = endpoint.rsplit('_', 1)[1]
+        for kind, requests in (('new', searches), ('page', pages)):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                latencies = list(pool.map(lambda body: post(endpoint, body), requests))
+            results[f'{name}_{kind}'] = _summary(latencies, time.perf_counter() - started)
+    return results
+
+
+def run_child(args):
+    """Benchmark the app in this process against the snapshot in CATALOG_SNAPSHOT"""
+    import logging
+    from werkzeug.serving import make_server
+    from src.app import app
+
+    logging.disable(logging.INFO)
+    app.debug = False
+    app.secret_key = 'benchmark'
+    data = synthetic.generate(args.child_size, seed=args.seed)
+    client = app.test_client()
+
+    def post_client(endpoint, body):
+        started = time.perf_counter()
+        response = client.post(endpoint, json=body)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    post_client('/api/songs_bands', {'genres': [{'genres': [data['genres'][0]]}]})
+    catalog_load_ms = (time.perf_counter() - started) * 1000
+
+    results = {'catalog_load_ms': round(catalog_load_ms, 1)}
+    results['test_client'] = _run(post_client, _request_bodies(data, args.queries), 1)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    local = threading.local()
+
+    def post_http(endpoint, body):
+        # One keep-alive connection per client thread
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection('127.0.0.1', server.server_port)
+        payload = json.dumps(body)
+        started = time.perf_counter()
+        local.connection.request('POST', endpoint, payload, {'Content-Type': 'application/json'})
+        response = local.connection.getresponse()
+        response.read()
+        assert response.status == 200
+        return (time.perf_counter() - started) * 1000
+
+    # Queries the test client has not seen, so new searches really rank
+    fresh = [body for body in _request_bodies(data, args.queries * 2)
+             if body not in _request_bodies(data, args.queries)]
+    results['http'] = _run(post_http, fresh, args.concurrency)
+    server.shutdown()
+
+    results['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(json.dumps(results))
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=50, help="distinct searches per endpoint")
+    parser.add_argument('--concurrency', type=int, default=4, help="client threads for the HTTP run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--child-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_size:
+        return run_child(args)
+
+    from src.utility.catalog import load_catalog
+
+    report = {'commit': _commit(), 'date': datetime.now().isoformat(timespec='seconds'), 'sizes': {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"{size} songs: building stand-in database and snapshot...", file=sys.stderr)
+            data = synthetic.generate(size, seed=args.seed)
+            db = synthetic.to_sqlite(data, os.path.join(workdir, f'catalog_{size}.sqlite'))
+            snapshot = os.path.join(workdir, f'catalog_{size}.snapshot')
+            load_catalog(db).save_snapshot(snapshot)
+            db.close()
+
+            # Keep the run out of the production query log, shared cache and
+            # precomputed tables, and let the first request load the catalog
+            env = dict(os.environ, CATALOG_SNAPSHOT=snapshot, CATALOG_RELOAD_INTERVAL='3600',
+                       QUERY_LOG_SAMPLE='0', WARMUP_QUERIES='0', SHARED_CACHE='',
+                       QUERY_LOG=os.path.join(workdir, 'query_log.jsonl'),
+                       RANKINGS_SNAPSHOT=os.path.join(workdir, 'rankings.snapshot'),
+                       NEIGHBORS_SNAPSHOT=os.path.join(workdir, 'neighbors.snapshot'))
+            output = subprocess.check_output(
+                [sys.executable, '-m', 'benchmarks.endpoints', '--child-size', str(size),
+                 '--queries', str(args.queries), '--concurrency', str(args.concurrency), '--seed', str(args.seed)],
+                env=env, text=True)
+            result = json.loads(output.strip().splitlines()[-1])
+            report['sizes'][str(size)] = result
+
+            print(f"{size} songs: catalog load {result['catalog_load_ms']} ms, peak RSS {result['peak_rss_mb']} MB")
+            for transport in ('test_client', 'http'):
+                for kind, stats in result[transport].items():
+                    print(f"  {transport:<11} {kind:<13} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                          f"p99 {stats['p99_ms']:8.2f} ms  {stats['throughput_rps']:8.1f} req/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Synthetic song catalogs in the configure_db.sql schema.
+
+Genre and artist popularity follow a Zipf-like curve, arrangement types
+follow their rough real-world frequency (most songs have lead, rhythm and
+bass, few have keyboard), and regions are drawn per song. Region density
+is scaled down from the live catalog (where most songs are available
+almost everywhere) so that a million-song stand-in still loads in
+reasonable time.
+"""
+import sqlite3
+import numpy as np
+from src.utility.catalog import Catalog
+
+GENRE_COUNT = 120
+REGION_COUNT = 40
+ARTIST_RATIO = 0.05
+
+# Share of songs carrying each arrangement type
+ARRANGEMENT_FREQUENCY = {
+    'lead': 0.92,
+    'rhythm': 0.88,
+    'bass': 0.85,
+    'ai_bass': 0.35,
+    'ai_chord': 0.30,
+    'alt_lead': 0.15,
+    'alt_rhythm': 0.12,
+    'alt_bass': 0.05,
+    'simple_guitar': 0.25,
+    'keyboard': 0.08,
+    'simple_keyboard': 0.06,
+}
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ra', 'tu', 'vo', 'sha', 'del', 'gor', 'fin', 'bre',
+             'zan', 'qui', 'pol', 'ter', 'vin', 'mar', 'lux', 'ost']
+
+SCHEMA = """
+    CREATE TABLE songs (
+        id INT PRIMARY KEY, artist VARCHAR(255), title VARCHAR(255), available BOOLEAN,
+        album VARCHAR(255), album_cover VARCHAR(512), duration TIME, dlc VARCHAR(255),
+        regions_available_count INT, regions_unavailable_count INT
+    );
+    CREATE TABLE genres (id INTEGER PRIMARY KEY, genre_name VARCHAR(50) UNIQUE);
+    CREATE TABLE song_genres (song_id INT, genre_id INT, PRIMARY KEY (song_id, genre_id));
+    CREATE TABLE arrangements (id INTEGER PRIMARY KEY, arrangement_name VARCHAR(50));
+    CREATE TABLE song_arrangements (song_id INT, arrangement_id INT, PRIMARY KEY (song_id, arrangement_id));
+    CREATE TABLE regions (id INTEGER PRIMARY KEY, region_code VARCHAR(2) UNIQUE);
+    CREATE TABLE song_regions (song_id INT, region_id INT, PRIMARY KEY (song_id, region_id));
+    CREATE INDEX idx_genre_id ON song_genres (genre_id);
+    CREATE INDEX idx_arrangement_id ON song_arrangements (arrangement_id);
+    CREATE INDEX idx_region_id ON song_regions (region_id);
+"""
+
+
+def _names(rng, count, words=2):
+    """Pseudo-words built from syllables, e.g. 'Kalo Ternemi'"""
+    parts = []
+    for _ in range(words):
+        lengths = rng.integers(2, 4, count)
+        picks = rng.integers(0, len(SYLLABLES), (count, 3))
+        parts.append([''.join(SYLLABLES[p] for p in row[:n]).capitalize() for row, n in zip(picks, lengths)])
+    return [' '.join(words) for words in zip(*parts)]
+
+
+def _unique(names):
+    """Suffix repeated names with a counter so they stay unique"""
+    seen = {}
+    unique = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        unique.append(name if seen[name] == 1 else f"{name} {seen[name]}")
+    return unique
+
+
+def _zipf(rng, size, n_values, exponent=1.0):
+    """Draw size values in [0, n_values) with Zipf-like skew"""
+    popularity = 1.0 / np.arange(1, n_values + 1) ** exponent
+    return rng.choice(n_values, size=size, p=popularity / popularity.sum())
+
+
+def _links(rows, cols):
+    """Deduplicated (row, col) link pairs"""
+    pairs = np.unique(np.stack([rows, cols], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def generate(n_songs, seed=0):
+    """Generate a catalog of n_songs as table columns and 0-based link arrays.
+
+    Database ids are row/column position + 1.
+    """
+    rng = np.random.default_rng(seed)
+    n_artists = max(1, int(n_songs * ARTIST_RATIO))
+    artist_names = _names(rng, n_artists)
+    album_names = _names(rng, max(1, n_songs // 8), words=1)
+
+    # 1-4 genres per song, mostly 1-2
+    per_song = np.minimum(rng.geometric(0.55, n_songs), 4)
+    genre_links = _links(np.repeat(np.arange(n_songs), per_song),
+                         _zipf(rng, int(per_song.sum()), GENRE_COUNT))
+
+    arrangement_names = list(ARRANGEMENT_FREQUENCY)
+    has_arrangement = rng.random((n_songs, len(arrangement_names))) < np.array(list(ARRANGEMENT_FREQUENCY.values()))
+    arrangement_links = np.nonzero(has_arrangement)
+
+    per_song = rng.integers(0, REGION_COUNT // 2, n_songs)
+    region_links = _links(np.repeat(np.arange(n_songs), per_song),
+                          rng.integers(0, REGION_COUNT, int(per_song.sum())))
+    regions_available = np.bincount(region_links[0], minlength=n_songs)
+
+    seconds = rng.integers(120, 420, n_songs)
+    return {
+        'songs': {
+            'id': np.arange(1, n_songs + 1),
+            'artist': [artist_names[a] for a in _zipf(rng, n_songs, n_artists, 0.8)],
+            'title': _names(rng, n_songs),
+            'available': rng.random(n_songs) < 0.97,
+            'album': [album_names[a] for a in rng.integers(0, len(album_names), n_songs)],
+            'album_cover': [''] * n_songs,
+            'duration': [f"00:{s // 60:02d}:{s % 60:02d}" for s in seconds],
+            'dlc': [''] * n_songs,
+            'regions_available_count': regions_available,
+            'regions_unavailable_count': REGION_COUNT - regions_available,
+        },
+        'genres': _unique([f"{name.lower()} {kind}" for name, kind in
+                           zip(_names(rng, GENRE_COUNT, words=1), np.resize(['rock', 'pop', 'metal', 'folk'], GENRE_COUNT))]),
+        'arrangements': arrangement_names,
+        'regions': [chr(65 + r // 26) + chr(65 + r % 26) for r in range(REGION_COUNT)],
+        'song_genres': genre_links,
+        'song_arrangements': arrangement_links,
+        'song_regions': region_links,
+    }
+
+
+def to_sqlite(data, path=':memory:'):
+    """Load generated data into an SQLite stand-in for the MySQL database"""
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.executescript(SCHEMA)
+    songs = data['songs']
+    columns = list(songs)
+    db.executemany(f"INSERT INTO songs ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+                   zip(*[np.asarray(songs[c]).tolist() for c in columns]))
+    for table, column in (('genres', 'genre_name'), ('arrangements', 'arrangement_name'), ('regions', 'region_code')):
+        db.executemany(f"INSERT INTO {table} (id, {column}) VALUES (?, ?)", enumerate(data[table], 1))
+    for table in ('song_genres', 'song_arrangements', 'song_regions'):
+        rows, cols = data[table]
+        db.executemany(f"INSERT INTO {table} VALUES (?, ?)", zip((rows + 1).tolist(), (cols + 1).tolist()))
+    db.commit()
+    return db
+
+
+def to_catalog(data):
+    """Build the app's in-memory catalog straight from generated data"""
+    songs = data['songs']
+    return Catalog.build(np.asarray(songs['id'], dtype=np.int64), songs['title'], songs['artist'], songs['album'],
+                         data['genres'], data['song_genres'], data['arrangements'], data['song_arrangements'],
+                         data['regions'], data['song_regions'])
+
+
+def random_weighted_queries(data, count, seed=1):
+    """Weighted searches of 1-4 distinct popular genres with weights 1-10"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        genres = np.unique(_zipf(rng, rng.integers(1, 5), len(data['genres'])))
+        queries.append([(data['genres'][g], float(rng.integers(1, 11))) for g in genres])
+    return queries
+
+
+def random_band_queries(data, count, seed=2):
+    """Band searches of 1-3 bands with 1-3 genres each"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        queries.append([[data['genres'][g] for g in _zipf(rng, rng.integers(1, 4), len(data['genres']))]
+                        for _ in range(rng.integers(1, 4))])
+    return queries
@@ -0,0 +1,98 @@
+"""Benchmark weighted genre scoring: catalog engine vs the legacy SQL ranking.
+
+Run from the project root:
+
+    python -m benchmarks.weighted_scoring --sizes 10000 100000 1000000
+
+The SQL side runs the old /api/songs_weighted ranking query against an
+SQLite stand-in loaded with the same synthetic catalog (--no-sql skips it,
+loading a million songs takes a while).
+"""
+import argparse
+import time
+import numpy as np
+from . import synthetic
+
+LEGACY_QUERY = """
+    SELECT s.id,
+        SUM(CASE {cases} ELSE 0 END) as genre_score
+    FROM songs s
+    LEFT JOIN song_genres sg ON s.id = sg.song_id
+    LEFT JOIN genres g ON sg.genre_id = g.id
+    LEFT JOIN song_arrangements sa ON s.id = sa.song_id
+    LEFT JOIN arrangements a ON sa.arrangement_id = a.id
+    WHERE g.genre_name IN ({placeholders})
+    GROUP BY s.id
+    HAVING genre_score > 0
+    ORDER BY genre_score DESC, s.id
+    LIMIT ?
+"""
+
+
+def rank_sql(db, weights, limit):
+    """Run the legacy weighted ranking query"""
+    cases = ' '.join(f"WHEN g.genre_name = ? THEN {weight}" for _, weight in weights)
+    names = [name for name, _ in weights]
+    query = LEGACY_QUERY.format(cases=cases, placeholders=','.join(['?'] * len(names)))
+    return db.execute(query, names + names + [limit]).fetchall()
+
+
+def rank_full_sort(catalog, weights, limit):
+    """Engine scoring followed by a full sort, to isolate the top-k gain"""
+    weight_vector = np.zeros(len(catalog.genre_names))
+    for column, (_, weight) in zip(catalog.genre_columns([n for n, _ in weights]), weights):
+        weight_vector[column] = weight
+    scores = np.bincount(catalog.genre_rows, weights=weight_vector[catalog.genre_indices],
+                         minlength=len(catalog)) * catalog.arrangement_counts
+    rows = np.flatnonzero(scores > 0)
+    return rows[np.lexsort((catalog.song_ids[rows], -scores[rows]))][:limit]
+
+
+def timed(fn, queries):
+    """Per-query latencies in milliseconds"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def report(label, latencies):
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"  {label:<12} mean {latencies.mean():9.3f} ms   p50 {p50:9.3f} ms   p95 {p95:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--no-sql', action='store_true', help="skip the SQLite legacy query")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"{size} songs")
+        data = synthetic.generate(size)
+        catalog = synthetic.to_catalog(data)
+        queries = synthetic.random_weighted_queries(data, args.queries)
+        report('top-k', timed(lambda q: catalog.rank_weighted(q, args.limit), queries))
+        report('full sort', timed(lambda q: rank_full_sort(catalog, q, args.limit), queries))
+
+        if not args.no_sql:
+            db = synthetic.to_sqlite(data)
+            sql_queries = queries[:max(1, args.queries // 10)]
+            report('sql', timed(lambda q: rank_sql(db, q, args.limit), sql_queries))
+
+            # Both paths must return the same songs in the same order
+            for query in sql_queries:
+                rows, scores = catalog.rank_weighted(query, args.limit)
+                expected = rank_sql(db, query, args.limit)
+                got = list(zip(catalog.song_ids[rows].tolist(), scores.tolist()))
+                if got != [(song_id, float(score)) for song_id, score in expected]:
+                    print(f"  MISMATCH for {query}")
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -57,6 +57,12 @@ CREATE TABLE song_regions (
     PRIMARY KEY (song_id, region_id)
 );
 
+-- Fingerprint of each song row from the last delta load (fast_populate_database.py --mode delta)
+CREATE TABLE song_fingerprints (
+    song_id INT PRIMARY KEY,
+    fingerprint CHAR(40) NOT NULL
+);
+
 -- Insert sample data for genres
 -- INSERT INTO genres (genre_name) VALUES 
 -- ('rock'),
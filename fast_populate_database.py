@@ -1,8 +1,22 @@
 from dotenv import load_dotenv
 import os
 import pymysql
+import argparse
 import csv
+import hashlib
+import json
+import multiprocessing
+import queue
+import tempfile
+import threading
+import time
+from collections import deque
 from datetime import datetime
+from src.utility.catalog import SNAPSHOT_PATH, load_catalog
+from src.utility.neighbors import NEIGHBORS_PATH, write_neighbors
+from src.utility.precomputed import DEFAULT_COMBOS, RANKINGS_PATH, write_rankings
+from src.utility.query_log import popular_queries, read_query_log
+from src.utility.query_profiler import profile_connection
 
 # Load environment variables
 load_dotenv()
@@ -17,9 +31,32 @@ config = {
     'charset': 'utf8mb4'
 }
 
-def connect_to_database():
+# Lookup tables and their name column
+LOOKUP_TABLES = {
+    'genres': 'genre_name',
+    'arrangements': 'arrangement_name',
+    'regions': 'region_code',
+}
+
+# Tables filled by LOAD DATA mode, in load order, with their TSV columns
+LOAD_DATA_TABLES = {
+    'genres': ('id', 'genre_name'),
+    'arrangements': ('id', 'arrangement_name'),
+    'regions': ('id', 'region_code'),
+    'songs': ('id', 'artist', 'title', 'available', 'album', 'album_cover', 'duration', 'dlc',
+              'regions_available_count', 'regions_unavailable_count'),
+    'song_genres': ('song_id', 'genre_id'),
+    'song_arrangements': ('song_id', 'arrangement_id'),
+    'song_regions': ('song_id', 'region_id'),
+}
+
+# Escapes for LOAD DATA's default FIELDS ESCAPED BY '\\'
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+def connect_to_database(local_infile=False):
     try:
         config_final = config.copy()
+        config_final['local_infile'] = local_infile
         if config['host'] == 'localhost' and os.name != 'nt':  # Not Windows
             config_final['unix_socket'] = '/var/lib/mysql/mysql.sock'
         elif config['host'] == 'localhost' and os.name == 'nt':  # Windows
@@ -30,7 +67,7 @@ def connect_to_database():
         cursor.execute("SELECT DATABASE();")
         record = cursor.fetchone()
         print(f"Connected to database: {record[0]}")
-        return connection
+        return profile_connection(connection)
     except Exception as e:
         print(f"Error connecting to MySQL Database: {e}")
         return None
@@ -89,8 +126,55 @@ def enable_indexes_and_constraints(connection):
     connection.commit()
     print("✅ Database constraints re-enabled")
 
+def load_lookup_maps(connection):
+    """Seed the genre, arrangement and region maps with the ids already in the database.
+
+    Keys are lower-cased because the lookup tables compare names
+    case-insensitively, so 'Rock' and 'rock' must share one id.
+    """
+    cursor = connection.cursor()
+    maps = {}
+    for table, column in LOOKUP_TABLES.items():
+        cursor.execute(f"SELECT id, {column} FROM {table}")
+        maps[table] = {name.strip().lower(): lookup_id for lookup_id, name in cursor.fetchall() if name}
+    cursor.close()
+    return maps
+
+def lookup_id(lookup, name, new_rows):
+    """Id for name, assigning the next free id (and queueing the row) if it is new"""
+    key = name.lower()
+    if key not in lookup:
+        lookup[key] = max(lookup.values(), default=0) + 1
+        new_rows.append((lookup[key], name))
+    return lookup[key]
+
+def parse_song_row(row):
+    """Split a CSV row into the songs tuple and its genre, arrangement and region names"""
+    song_data = (
+        int(row['ID']),
+        row['Artist'][:255] if row['Artist'] else '',
+        row['Title'][:255] if row['Title'] else '',
+        row['Available'].lower() == 'true',
+        row['Album'][:255] if row['Album'] else '',
+        row['Album Cover'][:512] if row['Album Cover'] else '',
+        row['Duration'] if row['Duration'] else None,
+        row['DLC'][:255] if row['DLC'] else '',
+        int(row['Regions Available Count']) if row['Regions Available Count'].strip() else 0,
+        int(row['Regions Unavailable Count']) if row['Regions Unavailable Count'].strip() else 0
+    )
+    genres = [g.strip() for g in row['Genres'].split('|') if g.strip()]
+    arrangements = [a.strip() for a in row['Arrangements'].split('|') if a.strip()]
+    regions = [r.strip() for r in row['Available Regions'].split('|') if r.strip()]
+    return song_data, genres, arrangements, regions
+
 def fast_bulk_insert_songs(connection, csv_file):
     """Fast bulk insert using optimized batch processing"""
+    # Track existing lookup values to avoid duplicates
+    maps = load_lookup_maps(connection)
+    genres_map = maps['genres']
+    arrangements_map = maps['arrangements']
+    regions_map = maps['regions']
+
     cursor = connection.cursor()
     
     # Prepare batch lists
@@ -103,11 +187,6 @@ def fast_bulk_insert_songs(connection, csv_file):
     song_arrangement_batch = []
     song_region_batch = []
     
-    # Track existing lookup values to avoid duplicates
-    genres_map = {}
-    arrangements_map = {}
-    regions_map = {}
-    
     batch_size = 1000
     total_processed = 0
     
@@ -118,46 +197,21 @@ def fast_bulk_insert_songs(connection, csv_file):
         
         for row in reader:
             try:
-                song_id = int(row['ID'])
-                
-                # Prepare song data (matching actual database structure)
-                song_data = (
-                    song_id,
-                    row['Artist'][:255] if row['Artist'] else '',
-                    row['Title'][:255] if row['Title'] else '',
-                    row['Available'].lower() == 'true',
-                    row['Album'][:255] if row['Album'] else '',
-                    row['Album Cover'][:512] if row['Album Cover'] else '',
-                    row['Duration'] if row['Duration'] else None,
-                    row['DLC'][:255] if row['DLC'] else '',
-                    int(row['Regions Available Count']) if row['Regions Available Count'].strip() else 0,
-                    int(row['Regions Unavailable Count']) if row['Regions Unavailable Count'].strip() else 0
-                )
+                song_data, genres, arrangements, regions = parse_song_row(row)
+                song_id = song_data[0]
                 song_batch.append(song_data)
                 
                 # Process genres
-                genres = [g.strip() for g in row['Genres'].split('|') if g.strip()]
                 for genre in genres:
-                    if genre not in genres_map:
-                        genres_map[genre] = len(genres_map) + 1
-                        genre_batch.append((genres_map[genre], genre))
-                    song_genre_batch.append((song_id, genres_map[genre]))
+                    song_genre_batch.append((song_id, lookup_id(genres_map, genre, genre_batch)))
                 
                 # Process arrangements
-                arrangements = [a.strip() for a in row['Arrangements'].split('|') if a.strip()]
                 for arrangement in arrangements:
-                    if arrangement not in arrangements_map:
-                        arrangements_map[arrangement] = len(arrangements_map) + 1
-                        arrangement_batch.append((arrangements_map[arrangement], arrangement))
-                    song_arrangement_batch.append((song_id, arrangements_map[arrangement]))
+                    song_arrangement_batch.append((song_id, lookup_id(arrangements_map, arrangement, arrangement_batch)))
                 
                 # Process regions
-                regions = [r.strip() for r in row['Available Regions'].split('|') if r.strip()]
                 for region in regions:
-                    if region not in regions_map:
-                        regions_map[region] = len(regions_map) + 1
-                        region_batch.append((regions_map[region], region))
-                    song_region_batch.append((song_id, regions_map[region]))
+                    song_region_batch.append((song_id, lookup_id(regions_map, region, region_batch)))
                 
                 total_processed += 1
                 
@@ -193,6 +247,361 @@ def fast_bulk_insert_songs(connection, csv_file):
     print(f"🎉 Bulk insert completed! Total songs: {total_processed}")
     return total_processed
 
+def tsv_line(values):
+    """Format one row for LOAD DATA INFILE, with \\N for NULL"""
+    fields = []
+    for value in values:
+        if value is None:
+            fields.append('\\N')
+        elif isinstance(value, bool):
+            fields.append('1' if value else '0')
+        else:
+            fields.append(str(value).translate(TSV_ESCAPES))
+    return '\t'.join(fields) + '\n'
+
+def write_tsv_files(csv_file, maps):
+    """Stream the CSV once into one temporary TSV file per table.
+
+    Returns {table: (path, row count)}; the caller removes the files.
+    """
+    files = {table: tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', suffix=f'.{table}.tsv', delete=False)
+             for table in LOAD_DATA_TABLES}
+    counts = dict.fromkeys(LOAD_DATA_TABLES, 0)
+    new_lookup_rows = {table: [] for table in LOOKUP_TABLES}
+    links = (('genres', 'song_genres'), ('arrangements', 'song_arrangements'), ('regions', 'song_regions'))
+
+    try:
+        with open(csv_file, 'r', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                try:
+                    song_data, *names = parse_song_row(row)
+                except Exception as e:
+                    print(f"❌ Error processing song {row.get('Title', 'Unknown')}: {e}")
+                    continue
+
+                song_id = song_data[0]
+                files['songs'].write(tsv_line(song_data))
+                counts['songs'] += 1
+                for (lookup_table, link_table), link_names in zip(links, names):
+                    for name in link_names:
+                        link_id = lookup_id(maps[lookup_table], name, new_lookup_rows[lookup_table])
+                        files[link_table].write(tsv_line((song_id, link_id)))
+                        counts[link_table] += 1
+
+                if counts['songs'] % 10000 == 0:
+                    print(f"✅ Parsed {counts['songs']} songs...")
+
+        for table, rows in new_lookup_rows.items():
+            for lookup_row in rows:
+                files[table].write(tsv_line(lookup_row))
+            counts[table] = len(rows)
+    finally:
+        for f in files.values():
+            f.close()
+
+    return {table: (files[table].name, counts[table]) for table in LOAD_DATA_TABLES}
+
+def load_data_insert_songs(connection, csv_file):
+    """Bulk load through per-table TSV files and LOAD DATA LOCAL INFILE"""
+    maps = load_lookup_maps(connection)
+
+    print(f"📖 Streaming CSV to TSV files: {csv_file}")
+    started = time.perf_counter()
+    files = write_tsv_files(csv_file, maps)
+    print(f"✅ Parsed {files['songs'][1]} songs in {time.perf_counter() - started:.1f}s")
+
+    cursor = connection.cursor()
+    try:
+        for table, columns in LOAD_DATA_TABLES.items():
+            path, count = files[table]
+            if not count:
+                continue
+            started = time.perf_counter()
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                LINES TERMINATED BY '\\n'
+                ({', '.join(columns)})
+            """, (path,))
+            connection.commit()
+            elapsed = max(time.perf_counter() - started, 1e-9)
+            print(f"✅ {table}: {count} rows in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)")
+    finally:
+        cursor.close()
+        for path, _ in files.values():
+            os.unlink(path)
+
+    print(f"🎉 LOAD DATA completed! Total songs: {files['songs'][1]}")
+    return files['songs'][1]
+
+# Table groups written by the parallel mode, one writer thread and connection each
+WRITER_GROUPS = {
+    'songs': ('genres', 'arrangements', 'regions', 'songs'),
+    'song_genres': ('song_genres',),
+    'song_arrangements': ('song_arrangements',),
+    'song_regions': ('song_regions',),
+}
+
+def parse_rows(rows):
+    """Parse a chunk of CSV rows in a pool worker, skipping bad rows"""
+    parsed = []
+    for row in rows:
+        try:
+            parsed.append(parse_song_row(row))
+        except Exception as e:
+            print(f"❌ Error processing song {row.get('Title', 'Unknown')}: {e}")
+    return parsed
+
+def read_chunks(csv_file, chunk_size):
+    with open(csv_file, 'r', encoding='utf-8') as file:
+        chunk = []
+        for row in csv.DictReader(file):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+class TableWriter(threading.Thread):
+    """Writer thread that owns a connection and inserts one group of tables"""
+
+    def __init__(self, group, max_queued):
+        super().__init__(name=f'writer-{group}', daemon=True)
+        self.group = group
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.rows_written = 0
+        self.error = None
+
+    def run(self):
+        connection = None
+        finished = False
+        try:
+            connection = connect_to_database()
+            if connection is None:
+                raise RuntimeError("could not connect")
+            disable_indexes_and_constraints(connection)
+            cursor = connection.cursor()
+            while True:
+                batch = self.queue.get()
+                if batch is None:
+                    finished = True
+                    break
+                for table in WRITER_GROUPS[self.group]:
+                    rows = batch.get(table)
+                    if rows:
+                        columns = LOAD_DATA_TABLES[table]
+                        cursor.executemany(
+                            f"INSERT IGNORE INTO {table} ({', '.join(columns)}) "
+                            f"VALUES ({', '.join(['%s'] * len(columns))})", rows)
+                        self.rows_written += len(rows)
+                connection.commit()
+            enable_indexes_and_constraints(connection)
+        except Exception as e:
+            self.error = e
+            # Keep draining so the producer never blocks on a dead writer
+            while not finished:
+                finished = self.queue.get() is None
+        finally:
+            if connection:
+                connection.close()
+
+def parallel_insert_songs(connection, csv_file, workers, chunk_size=2000, max_queued=8):
+    """Parse CSV chunks in a process pool and insert through one writer thread per table group.
+
+    Lookup ids are assigned here, in CSV order, so they come out the same
+    however many workers parse. At most two chunks per worker are read
+    ahead and the writer queues are bounded, so reading and parsing pause
+    whenever the database falls behind.
+    """
+    maps = load_lookup_maps(connection)
+    writers = {group: TableWriter(group, max_queued) for group in WRITER_GROUPS}
+    for writer in writers.values():
+        writer.start()
+
+    print(f"📖 Reading CSV: {csv_file} ({workers} parser processes, {len(writers)} writers)")
+    started = time.perf_counter()
+    last_report = started
+    total_processed = 0
+    links = (('genres', 'song_genres'), ('arrangements', 'song_arrangements'), ('regions', 'song_regions'))
+
+    def write_parsed(parsed):
+        nonlocal total_processed, last_report
+        batch = {table: [] for table in LOAD_DATA_TABLES}
+        for song_data, *names in parsed:
+            batch['songs'].append(song_data)
+            for (lookup_table, link_table), link_names in zip(links, names):
+                for name in link_names:
+                    link_id = lookup_id(maps[lookup_table], name, batch[lookup_table])
+                    batch[link_table].append((song_data[0], link_id))
+        total_processed += len(parsed)
+
+        for writer in writers.values():
+            if writer.error is None:
+                writer.queue.put(batch)
+
+        now = time.perf_counter()
+        if now - last_report >= 2:
+            last_report = now
+            depths = ', '.join(f"{group}={writer.queue.qsize()}" for group, writer in writers.items())
+            print(f"📊 {total_processed} songs parsed, {total_processed / (now - started):,.0f} songs/s, "
+                  f"queue depth: {depths}")
+
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            # Pool.imap would read the whole CSV ahead, so chunks are submitted
+            # through a bounded window and collected in CSV order
+            pending = deque()
+            for chunk in read_chunks(csv_file, chunk_size):
+                pending.append(pool.apply_async(parse_rows, (chunk,)))
+                if len(pending) >= workers * 2:
+                    write_parsed(pending.popleft().get())
+            while pending:
+                write_parsed(pending.popleft().get())
+    finally:
+        for writer in writers.values():
+            writer.queue.put(None)
+        for writer in writers.values():
+            writer.join()
+
+    failed = {group: writer.error for group, writer in writers.items() if writer.error is not None}
+    if failed:
+        raise RuntimeError(f"writers failed: {failed}")
+
+    elapsed = time.perf_counter() - started
+    for group, writer in writers.items():
+        print(f"✅ {group} writer: {writer.rows_written} rows ({writer.rows_written / elapsed:,.0f} rows/s)")
+    print(f"🎉 Parallel insert completed! Total songs: {total_processed}")
+    return total_processed
+
+def song_fingerprint(song_data, genres, arrangements, regions):
+    """Hash of a song's fields and its genre, arrangement and region sets"""
+    normalized = [
+        list(song_data),
+        sorted({g.lower() for g in genres}),
+        sorted({a.lower() for a in arrangements}),
+        sorted({r.lower() for r in regions}),
+    ]
+    return hashlib.sha1(json.dumps(normalized, default=str).encode('utf-8')).hexdigest()
+
+def _chunks(values, size=1000):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def clear_song_fingerprints(connection):
+    """Forget the delta fingerprints; a full load rewrites links they no longer describe"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SHOW TABLES LIKE 'song_fingerprints'")
+        if cursor.fetchone():
+            cursor.execute("DELETE FROM song_fingerprints")
+        connection.commit()
+    finally:
+        cursor.close()
+
+def delta_update_songs(connection, csv_file):
+    """Apply only the songs that changed since the last load, in one transaction.
+
+    Each CSV row is fingerprinted and compared with song_fingerprints.
+    New and changed songs are upserted with their links replaced, and
+    songs missing from the CSV are deleted; a row that fails to parse
+    keeps its song unchanged. The first run after a full load (which
+    clears song_fingerprints) treats every song as changed and records
+    the fingerprints.
+    """
+    maps = load_lookup_maps(connection)
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS song_fingerprints (
+            song_id INT PRIMARY KEY,
+            fingerprint CHAR(40) NOT NULL
+        )
+    """)
+    cursor.execute("SELECT song_id, fingerprint FROM song_fingerprints")
+    stored = dict(cursor.fetchall())
+    cursor.execute("SELECT id FROM songs")
+    existing = {song_id for (song_id,) in cursor.fetchall()}
+
+    print(f"📖 Fingerprinting CSV: {csv_file}")
+    seen = set()
+    changed = []
+    with open(csv_file, 'r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            try:
+                parsed = parse_song_row(row)
+            except Exception as e:
+                print(f"❌ Error processing song {row.get('Title', 'Unknown')}: {e}")
+                # A song whose row fails to parse is left as it is, never deleted;
+                # without a readable id there is no telling which song to keep
+                try:
+                    seen.add(int(row['ID']))
+                except (KeyError, TypeError, ValueError):
+                    raise ValueError(f"Unreadable song ID {row.get('ID')!r}; delta aborted so no song is deleted")
+                continue
+            song_id = parsed[0][0]
+            seen.add(song_id)
+            fingerprint = song_fingerprint(*parsed)
+            if song_id not in existing or stored.get(song_id) != fingerprint:
+                changed.append((parsed, fingerprint))
+
+    inserted = sum(1 for parsed, _ in changed if parsed[0][0] not in existing)
+    updated = len(changed) - inserted
+    deleted = existing - seen
+    print(f"🔍 {inserted} new, {updated} changed, {len(deleted)} removed, "
+          f"{len(seen) - len(changed)} unchanged")
+
+    new_lookup_rows = {table: [] for table in LOOKUP_TABLES}
+    links = {'song_genres': [], 'song_arrangements': [], 'song_regions': []}
+    for (song_data, genres, arrangements, regions), _ in changed:
+        for lookup_table, link_table, names in (('genres', 'song_genres', genres),
+                                                ('arrangements', 'song_arrangements', arrangements),
+                                                ('regions', 'song_regions', regions)):
+            for name in names:
+                links[link_table].append((song_data[0], lookup_id(maps[lookup_table], name, new_lookup_rows[lookup_table])))
+
+    song_columns = LOAD_DATA_TABLES['songs']
+    upsert_song = (f"INSERT INTO songs ({', '.join(song_columns)}) "
+                   f"VALUES ({', '.join(['%s'] * len(song_columns))}) "
+                   f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in song_columns[1:])}")
+    cleared = [parsed[0][0] for parsed, _ in changed if parsed[0][0] in existing] + list(deleted)
+
+    try:
+        connection.begin()
+        for table, rows in new_lookup_rows.items():
+            if rows:
+                cursor.executemany(f"INSERT IGNORE INTO {table} (id, {LOOKUP_TABLES[table]}) VALUES (%s, %s)", rows)
+
+        # Links of changed and removed songs are rebuilt from scratch
+        for chunk in _chunks(cleared):
+            placeholders = ','.join(['%s'] * len(chunk))
+            for table in links:
+                cursor.execute(f"DELETE FROM {table} WHERE song_id IN ({placeholders})", chunk)
+        for chunk in _chunks(deleted):
+            placeholders = ','.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM songs WHERE id IN ({placeholders})", chunk)
+            cursor.execute(f"DELETE FROM song_fingerprints WHERE song_id IN ({placeholders})", chunk)
+
+        for chunk in _chunks(changed):
+            cursor.executemany(upsert_song, [parsed[0] for parsed, _ in chunk])
+            cursor.executemany("""
+                INSERT INTO song_fingerprints (song_id, fingerprint) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE fingerprint = VALUES(fingerprint)
+            """, [(parsed[0][0], fingerprint) for parsed, fingerprint in chunk])
+        for table, rows in links.items():
+            for chunk in _chunks(rows):
+                cursor.executemany(f"INSERT IGNORE INTO {table} ({', '.join(LOAD_DATA_TABLES[table])}) VALUES (%s, %s)", chunk)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    print(f"🎉 Delta applied! {inserted} inserted, {updated} updated, {len(deleted)} deleted")
+    return len(changed) + len(deleted)
+
 def execute_batch_inserts(cursor, song_batch, genre_batch, arrangement_batch, 
                          region_batch, song_genre_batch, song_arrangement_batch, 
                          song_region_batch):
@@ -227,7 +636,37 @@ def execute_batch_inserts(cursor, song_batch, genre_batch, arrangement_batch,
     if song_region_batch:
         cursor.executemany("INSERT IGNORE INTO song_regions (song_id, region_id) VALUES (%s, %s)", song_region_batch)
 
+def write_catalog_snapshot(connection, path=SNAPSHOT_PATH):
+    """Write the read-only catalog snapshot, similar songs index and rankings table that the web app memory-maps"""
+    catalog = load_catalog(connection)
+
+    # The similar songs index and rankings table are tied to this catalog version;
+    # write them first so they are already in place when workers pick up the new snapshot
+    print(f"📦 Building similar songs index: {NEIGHBORS_PATH}")
+    write_neighbors(catalog)
+    print(f"✅ Similar songs index written ({os.path.getsize(NEIGHBORS_PATH) / 1024 / 1024:.1f} MB)")
+
+    print(f"📦 Building precomputed rankings: {RANKINGS_PATH}")
+    count = write_rankings(catalog, combos=popular_queries(read_query_log(), DEFAULT_COMBOS))
+    print(f"✅ {count} rankings written ({os.path.getsize(RANKINGS_PATH) / 1024 / 1024:.1f} MB)")
+
+    print(f"📦 Writing catalog snapshot: {path}")
+    catalog.save_snapshot(path)
+    print(f"✅ Snapshot {catalog.version} written ({os.path.getsize(path) / 1024 / 1024:.1f} MB, {len(catalog)} songs)")
+
 def main():
+    parser = argparse.ArgumentParser(description="Fast bulk population of the songs database")
+    parser.add_argument('--mode', choices=['batch', 'load-data', 'parallel', 'delta'], default='batch',
+                        help="batch: executemany in 1000 row batches; "
+                             "load-data: per-table TSV files loaded with LOAD DATA LOCAL INFILE; "
+                             "parallel: process pool parsing with one writer thread per table group; "
+                             "delta: apply only songs changed since the last delta run")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="parser processes for --mode parallel")
+    parser.add_argument('--csv', default='fullsongscrape_20250925-180052_deduplicated_20250925-201729.csv',
+                        help="scrape CSV to load")
+    args = parser.parse_args()
+
     print("=== FAST BULK DATABASE POPULATION ===")
     print("This script optimizes the database for fast bulk insertion.")
     print("⚠️ WARNING: This will disable constraints during population!")
@@ -237,7 +676,7 @@ def main():
         print("Operation cancelled.")
         return
     
-    connection = connect_to_database()
+    connection = connect_to_database(local_infile=args.mode == 'load-data')
     if not connection:
         print("Failed to connect to database")
         return
@@ -245,15 +684,30 @@ def main():
     try:
         start_time = datetime.now()
         
+        # A delta touches few rows in one transaction, so constraints stay on
+        bulk = args.mode != 'delta'
+        
         # Optimize database for bulk insert
-        disable_indexes_and_constraints(connection)
+        if bulk:
+            clear_song_fingerprints(connection)
+            disable_indexes_and_constraints(connection)
         
         # Perform bulk insert
-        csv_file = 'fullsongscrape_20250925-180052_deduplicated_20250925-201729.csv'
-        total_songs = fast_bulk_insert_songs(connection, csv_file)
+        if args.mode == 'delta':
+            total_songs = delta_update_songs(connection, args.csv)
+        elif args.mode == 'load-data':
+            total_songs = load_data_insert_songs(connection, args.csv)
+        elif args.mode == 'parallel':
+            total_songs = parallel_insert_songs(connection, args.csv, args.workers)
+        else:
+            total_songs = fast_bulk_insert_songs(connection, args.csv)
         
         # Re-enable constraints
-        enable_indexes_and_constraints(connection)
+        if bulk:
+            enable_indexes_and_constraints(connection)
+        
+        # Publish the new catalog to the web app workers
+        write_catalog_snapshot(connection)
         
         end_time = datetime.now()
         duration = end_time - start_time
@@ -266,7 +720,8 @@ def main():
     except Exception as e:
         print(f"❌ Error during population: {e}")
         # Always re-enable constraints even on error
-        enable_indexes_and_constraints(connection)
+        if args.mode != 'delta':
+            enable_indexes_and_constraints(connection)
         
     finally:
         if connection:
@@ -0,0 +1,59 @@
+from flask import Blueprint, jsonify, request
+from ..utility.catalog import get_catalog
+from ..utility.metrics import stage
+from ..utility.neighbors import get_neighbor_index, rank_similar
+import logging
+
+logger = logging.getLogger(__name__)
+api_similar_songs = Blueprint('similar_songs_api', __name__)
+
+@api_similar_songs.route('/api/songs/<int:song_id>/similar', methods=['GET'])
+def get_similar_songs(song_id):
+    """Songs most similar to song_id by genres.
+
+    sameArrangements=1 keeps only songs offering every arrangement the
+    chosen song has (they may offer more). Fewer than limit songs come
+    back only when fewer such songs share a genre with it.
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 50)
+    same_arrangements = request.args.get('sameArrangements', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        with stage('catalog'):
+            catalog = get_catalog()
+        if catalog is None:
+            logger.error("Database connection failed")
+            return jsonify({"error": "Database connection failed"}), 500
+
+        row = catalog.row_for_id(song_id)
+        if row is None:
+            return jsonify({"error": f"Song {song_id} not found"}), 404
+
+        index = get_neighbor_index(catalog)
+        if index is None:
+            return jsonify({"error": "Similar songs index is not built for this catalog"}), 503
+
+        with stage('rank'):
+            rows, scores = index.neighbors(row)
+            if same_arrangements:
+                # Keep songs offering every arrangement the chosen song has; when
+                # that leaves too few stored neighbors, rank the catalog live
+                mask = catalog.arrangement_masks[row]
+                keep = catalog.has_arrangements(rows, mask)
+                rows, scores = rows[keep], scores[keep]
+                if len(rows) < limit and len(rows) < len(keep):
+                    rows, scores = rank_similar(catalog, row, limit, mask)
+
+        with stage('page'):
+            songs = []
+            for neighbor, score in zip(rows[:limit], scores[:limit]):
+                song = catalog.song_row(neighbor)
+                song['similarity'] = round(float(score), 4)
+                songs.append(song)
+
+        with stage('serialize'):
+            return jsonify({'song': catalog.song_row(row), 'songs': songs})
+
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Blueprint, current_app, jsonify, request
+from ..utility.admission import Overloaded
+from ..utility.catalog import InvalidSearch, get_catalog
+from ..utility.metrics import stage
+from ..utility.pagination import InvalidPageToken, encode_body, paged_body
+from .get_songs_by_band_selection import rank_band_request
+from .get_songs_by_weighted import rank_weighted_request
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+api_songs_batch = Blueprint('songs_batch_api', __name__)
+
+# Most queries one batch may carry, so one request cannot hold a worker for long
+BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', 10))
+
+SEARCHES = {
+    'weighted': rank_weighted_request,
+    'bands': rank_band_request,
+}
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('BATCH_WORKERS', 4)),
+                               thread_name_prefix='batch-rank')
+
+def _genre_names(query):
+    """Genre names a weighted or band query mentions, skipping malformed entries"""
+    names = []
+    genres = query.get('genres')
+    for item in genres if isinstance(genres, list) else []:
+        if isinstance(item, dict):
+            if item.get('genre'):
+                names.append(str(item['genre']))
+            if isinstance(item.get('genres'), list):
+                names.extend(str(name) for name in item['genres'] if name)
+    return names
+
+def _rank(catalog, query, resolved):
+    search = SEARCHES.get(query.get('type'))
+    if search is None:
+        raise InvalidSearch(f"Unknown query type {query.get('type')!r}, expected one of {', '.join(SEARCHES)}")
+    return search(catalog, query, resolved)
+
+@api_songs_batch.route('/api/songs_batch', methods=['POST'])
+def get_songs_batch():
+    data = request.get_json()
+    if not data or not data.get('queries'):
+        return jsonify({"error": "No queries provided"}), 400
+
+    queries = data['queries']
+    per_page = 20  # Fixed page size
+
+    if not isinstance(queries, list) or not all(isinstance(query, dict) for query in queries):
+        return jsonify({"error": "queries must be a list of objects"}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {BATCH_MAX_QUERIES} queries per batch"}), 400
+
+    try:
+        with stage('catalog'):
+            catalog = get_catalog()
+        if catalog is None:
+            logger.error("Database connection failed")
+            return jsonify({"error": "Database connection failed"}), 500
+
+        # Rank every distinct query concurrently against the same catalog;
+        # repeated queries in one batch are ranked once, and the genres of
+        # all queries are resolved to catalog columns once for the batch
+        with stage('rank'):
+            resolved = catalog.resolve_genres([name for query in queries for name in _genre_names(query)])
+            keys = [json.dumps(query, sort_keys=True) for query in queries]
+            futures = {}
+            for key, query in zip(keys, queries):
+                if key not in futures:
+                    futures[key] = _executor.submit(_rank, catalog, query, resolved)
+            wait(futures.values())
+
+        # Results keep the order of the queries; a bad query gets an error entry
+        results = []
+        with stage('page'):
+            for key, query in zip(keys, queries):
+                try:
+                    query_key, rows, scores, fragment = futures[key].result()
+                    results.append(paged_body(catalog, query_key, rows, scores, fragment, query, per_page,
+                                              by_title=query.get('type') == 'bands'))
+                except KeyError as e:
+                    results.append({"error": f"Missing field {e}"})
+                except Overloaded as e:
+                    results.append({"error": str(e), "retryAfter": e.retry_after})
+                except (InvalidSearch, InvalidPageToken, TypeError, ValueError) as e:
+                    results.append({"error": str(e)})
+
+        with stage('serialize'):
+            body = b'{"results":[' + b','.join(encode_body(result) for result in results) + b']}\n'
+            return current_app.response_class(body, mimetype='application/json')
+
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
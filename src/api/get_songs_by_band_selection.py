@@ -1,152 +1,91 @@
-from flask import Blueprint, jsonify, request, session
-from ..utility.database_connect import get_db_connection
+from flask import Blueprint, jsonify, request
+from ..utility.catalog import InvalidSearch, get_catalog, int_field, search_filters
+from ..utility.admission import Overloaded
+from ..utility.metrics import stage
+from ..utility.pagination import InvalidPageToken, is_first_page, page_response, paged_body
+from ..utility.precomputed import rank_band_genres
+from ..utility.query_log import log_query
+from ..utility.result_cache import canonical_band_genres, get_ranked, band_query_key
+from ..utility.streaming import ndjson_response
 import logging
-from datetime import timedelta, datetime
-import uuid
-import json
 
 logger = logging.getLogger(__name__)
 api_songs_bands = Blueprint('songs_bands_api', __name__)
 
-def json_serializable(obj):
-    """Convert datetime/timedelta objects to strings for JSON serialization"""
-    if isinstance(obj, (datetime, timedelta)):
-        return str(obj)
-    return obj
+def rank_band_request(catalog, data, resolved=None):
+    """Rank a band search request; returns (query_key, rows, scores, fragment).
+
+    resolved optionally holds genres already looked up by Catalog.resolve_genres.
+    """
+    bands = data.get('genres', [])
+    if not bands:
+        raise InvalidSearch("No bands provided")
+    total_requested = int_field(data, 'totalRequested', 500, minimum=0, maximum=500)
+    filters = search_filters(data)
+
+    if not isinstance(bands, list) or not all(isinstance(band, dict) for band in bands):
+        raise InvalidSearch("genres must be a list of band objects")
+
+    genre_list = []
+    for band in bands:
+        if 'genres' in band:
+            if not isinstance(band['genres'], list):
+                raise InvalidSearch("A band's genres must be a list")
+            genre_list.extend([str(g).lower() for g in band['genres'] if g])
+
+    # Remove duplicates while preserving order
+    unique_genres = list(dict.fromkeys(genre_list))
+
+    # Rank the whole catalog in memory by number of matching genres, or look
+    # the ranking up when it was precomputed, reusing the ranking from an
+    # earlier page of the same search
+    query_key = band_query_key(unique_genres, total_requested, filters)
+    if is_first_page(data):
+        # Continuation pages would count one search many times
+        log_query('bands', canonical_band_genres(unique_genres), total_requested, filters)
+    rows, scores = get_ranked(catalog, query_key,
+                              lambda: rank_band_genres(catalog, unique_genres, total_requested, filters, resolved))
+    return query_key, rows, scores, catalog.band_fragment
 
 @api_songs_bands.route('/api/songs_bands', methods=['POST'])
 def get_songs_by_bands():
-    connection = get_db_connection()
-    if connection is None:
-        logger.error("Database connection failed")
-        return jsonify({"error": "Database connection failed"}), 500
-
     data = request.get_json()
     if not data or 'genres' not in data:
         return jsonify({"error": "No band data provided"}), 400
 
     bands = data.get('genres', [])
-    page = int(data.get('page', 1))
     per_page = 20  # Fixed page size
 
-    total_requested = min(int(data.get('totalRequested', 500)), 500)
-
     if not bands:
         return jsonify({"error": "No bands provided"}), 400
-    
+
 
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # Check if temp table exists and is accessible
-        if 'search_table' in session:
-            cursor.execute(f"""
-                SELECT COUNT(*) as table_exists 
-                FROM information_schema.tables 
-                WHERE table_name = '{session['search_table']}'
-            """)
-            table_exists = cursor.fetchone()['table_exists'] > 0
-        else:
-            table_exists = False
-
-        if not table_exists:
-            session['search_table'] = f"band_results_{uuid.uuid4().hex[:8]}"
-            
-            # Process bands data in Python instead of JSON_TABLE
-            genre_list = []
-            for band in bands:
-                if 'genres' in band:
-                    genre_list.extend([g.lower() for g in band['genres'] if g])
-            
-            # Remove duplicates while preserving order
-            unique_genres = list(dict.fromkeys(genre_list))
-            
-            # Create placeholders for IN clause
-            genre_placeholders = ','.join(['%s'] * len(unique_genres))
-
-            temp_table_query = f"""
-                CREATE TEMPORARY TABLE {session['search_table']} (
-                    id INT PRIMARY KEY,
-                    title VARCHAR(255),
-                    artist VARCHAR(255),
-                    genres TEXT,
-                    arrangements TEXT,
-                    match_score FLOAT
-                )
-                SELECT 
-                    s.id,
-                    s.title,
-                    s.artist,
-                    GROUP_CONCAT(DISTINCT g.genre_name) as genres,
-                    GROUP_CONCAT(DISTINCT 
-                        CASE a.arrangement_name
-                            WHEN 'ai_bass' THEN 'iconAIBass.png'
-                            WHEN 'ai_chord' THEN 'iconAIChord.png'
-                            WHEN 'bass' THEN 'iconBass.png'
-                            WHEN 'lead' THEN 'iconLead.png'
-                            WHEN 'rhythm' THEN 'iconRhythm.png'
-                            WHEN 'keyboard' THEN 'iconKeyboard.png'
-                            WHEN 'simple_keyboard' THEN 'iconSimpleKeyboard.png'
-                            WHEN 'alt_lead' THEN 'iconALTLead.png'
-                            WHEN 'alt_bass' THEN 'iconALTBass.png'
-                            WHEN 'simple_guitar' THEN 'iconSimpleGuitar.png'
-                            WHEN 'alt_rhythm' THEN 'iconALTRhythm.png'
-                            ELSE NULL
-                        END
-                    ) as arrangements,
-                    COUNT(DISTINCT CASE 
-                        WHEN LOWER(g.genre_name) IN ({genre_placeholders})
-                        THEN g.genre_name
-                        ELSE NULL
-                    END) as match_score
-                FROM songs s
-                LEFT JOIN song_genres sg ON s.id = sg.song_id
-                LEFT JOIN genres g ON sg.genre_id = g.id
-                LEFT JOIN song_arrangements sa ON s.id = sa.song_id
-                LEFT JOIN arrangements a ON sa.arrangement_id = a.id
-                GROUP BY s.id
-                HAVING match_score > 0
-                ORDER BY match_score DESC, s.title
-                LIMIT %s
-            """
-            # Execute with flattened genre list
-            cursor.execute(temp_table_query, unique_genres + [total_requested])
-            
-            # Get total count after creating table
-            cursor.execute(f"SELECT COUNT(*) as total FROM {session['search_table']}")
-            result = cursor.fetchone()
-            session['total_results'] = result['total'] if result else 0
-
-        # Calculate pagination
-        offset = (page - 1) * per_page
-        
-        # Fetch page from temp table
-        cursor.execute(f"""
-            SELECT * FROM {session['search_table']}
-            ORDER BY match_score DESC
-            LIMIT %s OFFSET %s
-        """, [per_page, offset])
-        
-        songs = cursor.fetchall()
-        
-        # Convert to JSON-serializable format
-        serializable_songs = [{k: json_serializable(v) for k, v in song.items()} 
-                            for song in songs]
-        
-        total_pages = (session['total_results'] + per_page - 1) // per_page
-        
-        return jsonify({
-            'songs': serializable_songs,
-            'total': session['total_results'],
-            'currentPage': page,
-            'totalPages': total_pages,
-            'hasMore': page < total_pages
-        })
+        with stage('catalog'):
+            catalog = get_catalog()
+        if catalog is None:
+            logger.error("Database connection failed")
+            return jsonify({"error": "Database connection failed"}), 500
+
+        with stage('rank'):
+            query_key, rows, scores, fragment = rank_band_request(catalog, data)
+
+        # Streaming mode sends the whole ranking as NDJSON instead of one page
+        if data.get('stream'):
+            with stage('serialize'):
+                return ndjson_response((fragment(row, score) for row, score in zip(rows, scores)), len(rows))
+
+        # Calculate pagination, continuing from a page token when given
+        with stage('page'):
+            body = paged_body(catalog, query_key, rows, scores, fragment, data, per_page, by_title=True)
+
+        with stage('serialize'):
+            return page_response(body)
 
+    except Overloaded as e:
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except (InvalidSearch, InvalidPageToken) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Database error: {str(e)}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
\ No newline at end of file
@@ -1,144 +1,84 @@
-from flask import Blueprint, jsonify, request, session
-from ..utility.database_connect import get_db_connection
+from flask import Blueprint, jsonify, request
+from ..utility.catalog import InvalidSearch, get_catalog, int_field, number_field, search_filters
+from ..utility.admission import Overloaded
+from ..utility.metrics import stage
+from ..utility.pagination import InvalidPageToken, is_first_page, page_response, paged_body
+from ..utility.precomputed import rank_weighted
+from ..utility.query_log import log_query
+from ..utility.result_cache import canonical_weights, get_ranked, weighted_query_key
+from ..utility.streaming import ndjson_response
 import logging
-from datetime import timedelta, datetime
-import uuid
 
 logger = logging.getLogger(__name__)
 api_songs_weighted = Blueprint('songs_weighted_api', __name__)
 
-def json_serializable(obj):
-    """Convert datetime/timedelta objects to strings for JSON serialization"""
-    if isinstance(obj, (datetime, timedelta)):
-        return str(obj)
-    return obj
+def rank_weighted_request(catalog, data, resolved=None):
+    """Rank a weighted search request; returns (query_key, rows, scores, fragment).
+
+    resolved optionally holds genres already looked up by Catalog.resolve_genres.
+    """
+    genres = data.get('genres', [])
+    if not genres:
+        raise InvalidSearch("Empty genres list")
+    total_requested = int_field(data, 'totalRequested', 500, minimum=0, maximum=500)
+    filters = search_filters(data)
+
+    # Rank the whole catalog in memory from the requested genre weights, or look
+    # the ranking up when it was precomputed, reusing the ranking from an
+    # earlier page of the same search
+    if not isinstance(genres, list) or not all(isinstance(genre_data, dict) and 'genre' in genre_data
+                                               for genre_data in genres):
+        raise InvalidSearch("genres must be a list of {genre, weight} objects")
+    weights = [(genre_data['genre'], number_field(genre_data, 'weight')) for genre_data in genres]
+    query_key = weighted_query_key(weights, total_requested, filters)
+    if is_first_page(data):
+        # Continuation pages would count one search many times
+        log_query('weighted', canonical_weights(weights), total_requested, filters)
+    rows, scores = get_ranked(catalog, query_key,
+                              lambda: rank_weighted(catalog, weights, total_requested, filters, resolved))
+
+    # Only the requested genres are listed for each song
+    columns = set(catalog.genre_columns([genre for genre, _ in weights], resolved))
+    return query_key, rows, scores, lambda row, score: catalog.weighted_fragment(row, score, columns)
 
 @api_songs_weighted.route('/api/songs_weighted', methods=['POST'])
 def get_songs():
-    connection = get_db_connection()
-    if connection is None:
-        logger.error("Database connection failed")
-        return jsonify({"error": "Database connection failed"}), 500
-
     data = request.get_json()
     if not data or 'genres' not in data:
         return jsonify({"error": "No genres provided"}), 400
 
     genres = data.get('genres', [])
-    page = int(data.get('page', 1))
     per_page = 20  # Fixed page size
-    total_requested = min(int(data.get('totalRequested', 500)), 500)
-    
+
     if not genres:
         return jsonify({"error": "Empty genres list"}), 400
 
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # Check if temp table exists and is accessible
-        if 'search_table' in session:
-            cursor.execute(f"""
-                SELECT COUNT(*) as table_exists 
-                FROM information_schema.tables 
-                WHERE table_name = '{session['search_table']}'
-            """)
-            table_exists = cursor.fetchone()['table_exists'] > 0
-        else:
-            table_exists = False
+        with stage('catalog'):
+            catalog = get_catalog()
+        if catalog is None:
+            logger.error("Database connection failed")
+            return jsonify({"error": "Database connection failed"}), 500
+
+        with stage('rank'):
+            query_key, rows, scores, fragment = rank_weighted_request(catalog, data)
 
-        # Create temp table for new search or if previous table is gone
-        if not table_exists:
-            # Generate unique table name
-            session['search_table'] = f"weighted_results_{uuid.uuid4().hex[:8]}"
-            
-            # Build CASE statement for genre weights
-            genre_cases = []
-            genre_values = []
-            for genre_data in genres:
-                genre = genre_data['genre']
-                weight = float(genre_data['weight'])
-                genre_cases.append(f"WHEN g.genre_name = %s THEN {weight}")
-                genre_values.append(genre)
+        # Streaming mode sends the whole ranking as NDJSON instead of one page
+        if data.get('stream'):
+            with stage('serialize'):
+                return ndjson_response((fragment(row, score) for row, score in zip(rows, scores)), len(rows))
 
-            # Create and populate temp table
-            temp_table_query = f"""
-                CREATE TEMPORARY TABLE {session['search_table']} (
-                    id INT PRIMARY KEY,
-                    title VARCHAR(255),
-                    artist VARCHAR(255),
-                    genres TEXT,
-                    arrangements TEXT,
-                    genre_score FLOAT
-                )
-                SELECT s.id, s.title, s.artist,
-                    GROUP_CONCAT(DISTINCT g.genre_name) as genres,
-                    GROUP_CONCAT(DISTINCT 
-                        CASE a.arrangement_name
-                            WHEN 'ai_bass' THEN 'iconAIBass.png'
-                            WHEN 'ai_chord' THEN 'iconAIChord.png'
-                            WHEN 'bass' THEN 'iconBass.png'
-                            WHEN 'lead' THEN 'iconLead.png'
-                            WHEN 'rhythm' THEN 'iconRhythm.png'
-                            WHEN 'keyboard' THEN 'iconKeyboard.png'
-                            WHEN 'simple_keyboard' THEN 'iconSimpleKeyboard.png'
-                            WHEN 'alt_lead' THEN 'iconALTLead.png'
-                            WHEN 'alt_bass' THEN 'iconALTBass.png'
-                            WHEN 'simple_guitar' THEN 'iconSimpleGuitar.png'
-                            WHEN 'alt_rhythm' THEN 'iconALTRhythm.png'
-                            ELSE NULL
-                        END
-                    ) as arrangements,
-                    SUM(CASE 
-                        {" ".join(genre_cases)}
-                        ELSE 0 
-                    END) as genre_score
-                FROM songs s
-                LEFT JOIN song_genres sg ON s.id = sg.song_id
-                LEFT JOIN genres g ON sg.genre_id = g.id
-                LEFT JOIN song_arrangements sa ON s.id = sa.song_id
-                LEFT JOIN arrangements a ON sa.arrangement_id = a.id
-                WHERE g.genre_name IN ({','.join(['%s'] * len(genre_values))})
-                GROUP BY s.id
-                HAVING genre_score > 0
-                ORDER BY genre_score DESC
-                LIMIT %s
-            """
-            cursor.execute(temp_table_query, genre_values + genre_values + [total_requested])
-            
-            # Get total count
-            cursor.execute(f"SELECT COUNT(*) as total FROM {session['search_table']}")
-            session['total_results'] = cursor.fetchone()['total']
+        # Calculate pagination, continuing from a page token when given
+        with stage('page'):
+            body = paged_body(catalog, query_key, rows, scores, fragment, data, per_page)
 
-        # Calculate pagination
-        offset = (page - 1) * per_page
-        
-        # Fetch page from temp table
-        cursor.execute(f"""
-            SELECT * FROM {session['search_table']}
-            ORDER BY genre_score DESC
-            LIMIT %s OFFSET %s
-        """, [per_page, offset])
-        
-        songs = cursor.fetchall()
-        
-        # Convert to JSON-serializable format
-        serializable_songs = [{k: json_serializable(v) for k, v in song.items()} 
-                            for song in songs]
-        
-        total_pages = (session['total_results'] + per_page - 1) // per_page
-        
-        return jsonify({
-            'songs': serializable_songs,
-            'total': session['total_results'],
-            'currentPage': page,
-            'totalPages': total_pages,
-            'hasMore': page < total_pages
-        })
+        with stage('serialize'):
+            return page_response(body)
 
+    except Overloaded as e:
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except (InvalidSearch, InvalidPageToken) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Database error: {str(e)}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
\ No newline at end of file
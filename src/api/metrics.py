@@ -0,0 +1,21 @@
+from flask import Blueprint, Response
+from ..utility.admission import get_admission_stats
+from ..utility.database_connect import get_pool_stats
+from ..utility.metrics import render_prometheus
+from ..utility.precomputed import ranking_table_stats
+from ..utility.result_cache import get_result_cache, get_shared_cache_stats
+from ..utility.warmup import get_warmup_stats
+
+api_metrics = Blueprint('metrics_api', __name__)
+
+@api_metrics.route('/metrics', methods=['GET'])
+def get_metrics():
+    body = render_prometheus({
+        'app_result_cache': ("Ranked result cache counters", get_result_cache().stats(), 'stat'),
+        'app_shared_result_cache': ("Shared result cache tier counters", get_shared_cache_stats(), 'stat'),
+        'app_connection_pool': ("Database connection pool counters", get_pool_stats(), 'stat'),
+        'app_precomputed_rankings': ("Precomputed rankings table lookups", ranking_table_stats(), 'stat'),
+        'app_admission': ("Ranking admission control and single-flight counters", get_admission_stats(), 'stat'),
+        'app_warmup': ("Worker warm-up progress, duration and primed queries", get_warmup_stats(), 'stat'),
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,43 @@
+from flask import Blueprint, jsonify, request
+from ..utility.catalog import get_catalog
+from ..utility.metrics import stage
+from ..utility.search_index import ALBUM, ARTIST, KINDS, search
+import logging
+
+logger = logging.getLogger(__name__)
+api_search = Blueprint('search_api', __name__)
+
+@api_search.route('/api/search', methods=['GET'])
+def search_catalog():
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    kind = request.args.get('type')
+    if kind and kind not in KINDS:
+        return jsonify({"error": f"type must be one of {', '.join(KINDS)}"}), 400
+
+    try:
+        with stage('catalog'):
+            catalog = get_catalog()
+        if catalog is None:
+            logger.error("Database connection failed")
+            return jsonify({"error": "Database connection failed"}), 500
+
+        with stage('rank'):
+            matches = search(catalog, query, limit, [KINDS.index(kind)] if kind else None)
+
+        results = []
+        for match_kind, row, weight in matches:
+            if match_kind == ARTIST:
+                results.append({'type': 'artist', 'value': catalog.artists[row], 'songs': weight // 2})
+            elif match_kind == ALBUM:
+                results.append({'type': 'album', 'value': catalog.albums[row],
+                                'artist': catalog.artists[row], 'songs': weight // 2})
+            else:
+                results.append({'type': 'title', 'value': catalog.titles[row],
+                                'artist': catalog.artists[row], 'id': int(catalog.song_ids[row])})
+
+        return jsonify({'results': results})
+
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
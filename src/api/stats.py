@@ -0,0 +1,12 @@
+from flask import Blueprint, jsonify
+from ..utility.database_connect import get_pool_stats
+from ..utility.result_cache import get_result_cache
+
+api_stats = Blueprint('stats_api', __name__)
+
+@api_stats.route('/api/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        'resultCache': get_result_cache().stats(),
+        'connectionPool': get_pool_stats()
+    })
@@ -1,6 +1,13 @@
 from flask import Flask, render_template
 from .api.get_songs_by_weighted import api_songs_weighted
 from .api.get_songs_by_band_selection import api_songs_bands
+from .api.get_songs_batch import api_songs_batch
+from .api.get_similar_songs import api_similar_songs
+from .api.search import api_search
+from .api.stats import api_stats
+from .api.metrics import api_metrics
+from .utility import metrics
+from .utility.warmup import start_warmup
 import logging
 import os
 from dotenv import load_dotenv
@@ -37,6 +44,17 @@ def about():
 # Register the API blueprint
 app.register_blueprint(api_songs_weighted)
 app.register_blueprint(api_songs_bands)
+app.register_blueprint(api_songs_batch)
+app.register_blueprint(api_similar_songs)
+app.register_blueprint(api_search)
+app.register_blueprint(api_stats)
+app.register_blueprint(api_metrics)
+
+# Stage timings: Server-Timing header and /metrics histograms
+metrics.init_app(app)
+
+# Load the catalog and prime the result cache with popular queries in the background
+start_warmup()
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""Admission control for new rankings.
+
+A ranking that misses every cache costs a full pass over the catalog, and
+a burst of them would starve the cheap page requests served from cache
+on the same worker. Rankings therefore go through two gates:
+
+- SingleFlight: concurrent requests for the same ranking share one
+  computation; followers wait for the leader's result.
+- AdmissionControl: at most RANK_CONCURRENCY rankings run at once, with up
+  to RANK_QUEUE more waiting up to RANK_QUEUE_TIMEOUT seconds for a slot.
+  Anything beyond that is shed with Overloaded, which the endpoints turn
+  into a 503 with a Retry-After of RANK_RETRY_AFTER seconds.
+
+Limits and counters are per worker process.
+"""
+import os
+import threading
+
+
+class Overloaded(Exception):
+    """Raised when a ranking is shed because the worker is at capacity"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionControl:
+    """Concurrency limit with a bounded, time-limited wait queue"""
+
+    def __init__(self, limit=4, queue_size=16, queue_timeout=5.0, retry_after=2):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def _acquire(self):
+        if self._slots.acquire(blocking=False):
+            return
+        with self._lock:
+            if self.queued >= self.queue_size:
+                self.shed += 1
+                raise Overloaded(f"Too many searches in progress, retry in {self.retry_after}s",
+                                 self.retry_after)
+            self.queued += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self.queued -= 1
+        if not acquired:
+            with self._lock:
+                self.shed += 1
+            raise Overloaded(f"Timed out waiting for a search slot, retry in {self.retry_after}s",
+                             self.retry_after)
+
+    def run(self, compute):
+        """Return compute() once a slot is free, raising Overloaded if none frees up in time"""
+        self._acquire()
+        with self._lock:
+            self.active += 1
+            self.admitted += 1
+        try:
+            return compute()
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'active': self.active,
+                'queue_size': self.queue_size,
+                'queue_depth': self.queued,
+                'admitted': self.admitted,
+                'shed': self.shed,
+            }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one computation per key at a time and shares its outcome with concurrent callers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def run(self, key, compute):
+        """compute() for key, or the result of the call for key already in progress"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+            return flight.result
+        except BaseException as e:
+            # Followers get the same error, e.g. Overloaded or InvalidSearch
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+            }
+
+
+_admission = AdmissionControl(
+    limit=int(os.getenv('RANK_CONCURRENCY', 4)),
+    queue_size=int(os.getenv('RANK_QUEUE', 16)),
+    queue_timeout=float(os.getenv('RANK_QUEUE_TIMEOUT', 5)),
+    retry_after=int(os.getenv('RANK_RETRY_AFTER', 2))
+)
+_flights = SingleFlight()
+
+
+def admit(compute):
+    """Run an expensive ranking under this worker's admission control"""
+    return _admission.run(compute)
+
+
+def single_flight(key, compute):
+    """Run compute() once for all concurrent callers with the same key"""
+    return _flights.run(key, compute)
+
+
+def get_admission_stats():
+    """Admission and coalescing counters of this worker"""
+    stats = _admission.stats()
+    stats.update(_flights.stats())
+    return stats
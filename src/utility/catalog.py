@@ -0,0 +1,631 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from .catalog_snapshot import SnapshotError, StringTable, file_stamp, read_snapshot, write_snapshot
+from .database_connect import get_db_connection
+from .metrics import stage
+from .search_index import build_search_index
+
+logger = logging.getLogger(__name__)
+
+# Icon shown in the results table for each arrangement type
+ARRANGEMENT_ICONS = {
+    'ai_bass': 'iconAIBass.png',
+    'ai_chord': 'iconAIChord.png',
+    'bass': 'iconBass.png',
+    'lead': 'iconLead.png',
+    'rhythm': 'iconRhythm.png',
+    'keyboard': 'iconKeyboard.png',
+    'simple_keyboard': 'iconSimpleKeyboard.png',
+    'alt_lead': 'iconALTLead.png',
+    'alt_bass': 'iconALTBass.png',
+    'simple_guitar': 'iconSimpleGuitar.png',
+    'alt_rhythm': 'iconALTRhythm.png',
+}
+
+# Binary snapshot written by fast_populate_database.py; used instead of MySQL when present
+SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT',
+                          os.path.join(os.path.dirname(__file__), '..', '..', 'catalog.snapshot'))
+
+# Seconds between checks for a newer snapshot file
+RELOAD_INTERVAL = float(os.getenv('CATALOG_RELOAD_INTERVAL', 30))
+
+_catalog = None
+_catalog_lock = threading.Lock()
+_snapshot_stamp = None
+_next_reload_check = 0.0
+_reloading = False
+_reload_listeners = []
+
+
+class InvalidSearch(ValueError):
+    """Raised when a search request is missing or has malformed fields"""
+
+
+def int_field(data, name, default, minimum=None, maximum=None):
+    """Integer request field, clamped to maximum; InvalidSearch if malformed or below minimum"""
+    value = data.get(name, default)
+    try:
+        if isinstance(value, bool) or float(value) != int(float(value)):
+            raise ValueError
+        value = int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidSearch(f"{name} must be an integer")
+    if minimum is not None and value < minimum:
+        raise InvalidSearch(f"{name} must be at least {minimum}")
+    return value if maximum is None else min(value, maximum)
+
+
+def number_field(data, name):
+    """Required finite number request field; InvalidSearch if missing or malformed"""
+    if name not in data:
+        raise InvalidSearch(f"Missing field {name!r}")
+    value = data[name]
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        value = float(value)
+    except (TypeError, ValueError):
+        raise InvalidSearch(f"{name} must be a number")
+    if not math.isfinite(value):
+        raise InvalidSearch(f"{name} must be a finite number")
+    return value
+
+
+def search_filters(data):
+    """Optional result filters of a search request, e.g. {'region': 'US'}"""
+    filters = {}
+    if data.get('region'):
+        filters['region'] = str(data['region']).strip().upper()
+    if data.get('arrangements'):
+        arrangements = data['arrangements']
+        if isinstance(arrangements, str):
+            arrangements = [arrangements]
+        filters['arrangements'] = sorted({str(name).strip().lower() for name in arrangements})
+        match = data.get('arrangementMatch', 'any')
+        if match not in ('any', 'all'):
+            raise InvalidSearch("arrangementMatch must be 'any' or 'all'")
+        filters['arrangementMatch'] = match
+    return filters
+
+
+def _build_csr(rows, cols, n_rows):
+    """Build CSR (indptr, indices) arrays from parallel row/column index arrays"""
+    order = np.lexsort((cols, rows))
+    rows = rows[order]
+    cols = cols[order]
+
+    # Drop duplicate (row, col) pairs
+    if len(rows):
+        keep = np.ones(len(rows), dtype=bool)
+        keep[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        rows = rows[keep]
+        cols = cols[keep]
+
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols.astype(np.int32)
+
+
+def _encode_json(value):
+    """Compact JSON with sorted keys and ASCII escapes, as jsonify produces outside debug mode"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+
+def normalize_genre(name):
+    """Key used to match genre names, mirroring MySQL's case-insensitive comparison"""
+    return str(name).strip().lower()
+
+
+def _bitset(rows, n_songs):
+    """Pack a set of song rows into a bitset of uint64 words"""
+    bits = np.zeros(-(-n_songs // 64) * 64, dtype=bool)
+    bits[rows] = True
+    return np.packbits(bits, bitorder='little').view(np.uint64)
+
+
+def _unpack_bitset(words, n_songs):
+    """Expand a uint64 bitset back into one 0/1 byte per song row"""
+    return np.unpackbits(words.view(np.uint8), count=n_songs, bitorder='little')
+
+
+def _test_bits(words, rows):
+    """Whether each of rows is set in a uint64 bitset"""
+    return (words.view(np.uint8)[rows >> 3] >> (rows & 7)) & 1 == 1
+
+
+def _map_ids(ids, sorted_ids):
+    """Map database ids to row positions in sorted_ids, -1 where unknown"""
+    if len(sorted_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, ids)
+    positions[positions == len(sorted_ids)] = 0
+    return np.where(sorted_ids[positions] == ids, positions, -1)
+
+
+class Catalog:
+    """Read-only, array-backed copy of the song catalog used for ranking.
+
+    Catalogs are either built from database rows with Catalog.build() or
+    opened from a snapshot file, in which case every array is a zero-copy
+    view of the memory-mapped file.
+    """
+
+    # Numpy arrays and string tables that make up a catalog (and a snapshot)
+    ARRAYS = ('song_ids', 'title_rank', 'genre_indptr', 'genre_indices', 'genre_rows',
+              'genre_bitsets', 'arrangement_indptr', 'arrangement_indices', 'arrangement_counts',
+              'region_indptr', 'region_indices', 'region_bitsets', 'arrangement_masks',
+              'search_kinds', 'search_rows', 'search_weights')
+    STRINGS = ('titles', 'artists', 'albums', 'genre_names', 'genre_bitset_keys',
+               'arrangement_names', 'region_codes', 'search_keys')
+    # Pre-encoded JSON pieces of each song's output, see _encode_fragments
+    FRAGMENTS = ('fragment_heads', 'fragment_genres', 'fragment_tails')
+
+    def __init__(self, version=None, **columns):
+        # Songs are addressed by row position; song_ids holds the database id per row
+        for name in self.ARRAYS + self.STRINGS:
+            setattr(self, name, columns[name])
+        self.version = version
+        if self.arrangement_masks.ndim == 1:
+            # Snapshots written before masks grew past one word
+            self.arrangement_masks = self.arrangement_masks.reshape(-1, 1)
+
+        # Genre names are normalized once here rather than per row per query
+        self.genre_lookup = {}
+        for column, name in enumerate(self.genre_names):
+            self.genre_lookup.setdefault(normalize_genre(name), column)
+        self.genre_bitset_rows = {key: i for i, key in enumerate(self.genre_bitset_keys)}
+        self.region_lookup = {code.strip().upper(): column for column, code in enumerate(self.region_codes)}
+        self.arrangement_lookup = {name.strip().lower(): column for column, name in enumerate(self.arrangement_names)}
+
+        self.arrangement_icons = [ARRANGEMENT_ICONS.get(name) for name in self.arrangement_names]
+
+        if all(name in columns for name in self.FRAGMENTS):
+            for name in self.FRAGMENTS:
+                setattr(self, name, columns[name])
+        else:
+            self._encode_fragments()
+
+    def _encode_fragments(self):
+        """Encode the fixed parts of every song's JSON output once.
+
+        Output objects have sorted keys (arrangements, artist, [genre_score],
+        genres, id, [match_score], title), encoded the way jsonify does. The
+        head holds arrangements and artist, the tail holds title; the id and
+        score, and for weighted searches the genres, go between them per query.
+        """
+        heads, genres, tails = [], [], []
+        for row in range(len(self)):
+            heads.append(_encode_json({'arrangements': self.song_arrangements(row),
+                                       'artist': self.artists[row]})[:-1] + ',')
+            genres.append(_encode_json(self.song_genres(row)))
+            tails.append(',' + _encode_json({'title': self.titles[row]})[1:])
+        self.fragment_heads = StringTable.from_strings(heads)
+        self.fragment_genres = StringTable.from_strings(genres)
+        self.fragment_tails = StringTable.from_strings(tails)
+
+    @classmethod
+    def build(cls, song_ids, titles, artists, albums, genre_names, song_genre_links,
+              arrangement_names, song_arrangement_links, region_codes, song_region_links,
+              version=None):
+        """Build a catalog from song columns and (song row, column) link arrays"""
+        n_songs = len(song_ids)
+        columns = {
+            'song_ids': song_ids,
+            'titles': titles,
+            'artists': artists,
+            'albums': albums,
+            'genre_names': genre_names,
+            'arrangement_names': arrangement_names,
+            'region_codes': region_codes,
+        }
+
+        # song x genre, song x arrangement and song x region incidence in CSR form
+        rows, cols = song_genre_links
+        genre_indptr, genre_indices = _build_csr(rows, cols, n_songs)
+        columns['genre_indptr'] = genre_indptr
+        columns['genre_indices'] = genre_indices
+        # Song row of every stored genre entry, for scoring with bincount
+        genre_rows = np.repeat(np.arange(n_songs, dtype=np.int32), np.diff(genre_indptr))
+        columns['genre_rows'] = genre_rows
+
+        rows, cols = song_arrangement_links
+        columns['arrangement_indptr'], columns['arrangement_indices'] = _build_csr(rows, cols, n_songs)
+        # The ranking join repeats each genre row once per arrangement row
+        columns['arrangement_counts'] = np.maximum(np.diff(columns['arrangement_indptr']), 1)
+
+        # One bit per arrangement type for each song, for the arrangements filter;
+        # a row of uint64 words per song, as many as the arrangement types need
+        arrangement_masks = np.zeros((n_songs, max(1, -(-len(arrangement_names) // 64))), dtype=np.uint64)
+        arrangement_columns = columns['arrangement_indices'].astype(np.uint64)
+        np.bitwise_or.at(arrangement_masks,
+                         (np.repeat(np.arange(n_songs), np.diff(columns['arrangement_indptr'])),
+                          (arrangement_columns // np.uint64(64)).astype(np.int64)),
+                         np.left_shift(np.uint64(1), arrangement_columns % np.uint64(64)))
+        columns['arrangement_masks'] = arrangement_masks
+
+        rows, cols = song_region_links
+        region_indptr, region_indices = _build_csr(rows, cols, n_songs)
+        columns['region_indptr'] = region_indptr
+        columns['region_indices'] = region_indices
+
+        # Availability bitset per region, for filtering candidates by region
+        region_rows = np.repeat(np.arange(n_songs, dtype=np.int32), np.diff(region_indptr))
+        region_counts = np.bincount(region_indices, minlength=len(region_codes))
+        songs_by_region = np.split(region_rows[np.argsort(region_indices, kind='stable')],
+                                   np.cumsum(region_counts)[:-1])
+        columns['region_bitsets'] = np.array([_bitset(songs, n_songs) for songs in songs_by_region],
+                                             dtype=np.uint64).reshape(len(region_codes), -(-n_songs // 64))
+
+        # Inverted index: normalized genre -> bitset of the songs tagged with it
+        bitsets = {}
+        genre_counts = np.bincount(genre_indices, minlength=len(genre_names))
+        songs_by_genre = np.split(genre_rows[np.argsort(genre_indices, kind='stable')],
+                                  np.cumsum(genre_counts)[:-1])
+        for column, name in enumerate(genre_names):
+            key = normalize_genre(name)
+            bitset = _bitset(songs_by_genre[column], n_songs)
+            if key in bitsets:
+                bitset |= bitsets[key]
+            bitsets[key] = bitset
+        columns['genre_bitset_keys'] = list(bitsets)
+        columns['genre_bitsets'] = np.array(list(bitsets.values()), dtype=np.uint64).reshape(
+            len(bitsets), -(-n_songs // 64))
+
+        # Position of each song when ordered by title, used as a sort key
+        by_title = sorted(range(n_songs), key=lambda r: ((titles[r] or '').lower(), song_ids[r]))
+        title_rank = np.empty(n_songs, dtype=np.int64)
+        title_rank[by_title] = np.arange(n_songs)
+        columns['title_rank'] = title_rank
+
+        # Typeahead prefix index over artists, titles and albums
+        columns.update(build_search_index(titles, artists, albums))
+
+        return cls(version=version, **columns)
+
+    @classmethod
+    def open_snapshot(cls, path):
+        """Open a snapshot file as a catalog of zero-copy, memory-mapped arrays"""
+        version, arrays, strings, mapped = read_snapshot(path)
+        missing = set(cls.ARRAYS + cls.STRINGS + cls.FRAGMENTS) - set(arrays) - set(strings)
+        if missing:
+            raise SnapshotError(f"{path} was written by an older release (missing {', '.join(sorted(missing))})")
+        catalog = cls(version=version, **arrays, **strings)
+        catalog._mapped = mapped
+        return catalog
+
+    def save_snapshot(self, path):
+        """Write this catalog to a snapshot file"""
+        write_snapshot(path, self.version,
+                       {name: getattr(self, name) for name in self.ARRAYS},
+                       {name: getattr(self, name) for name in self.STRINGS + self.FRAGMENTS})
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    def row_for_id(self, song_id):
+        """Row of a database song id, None if the catalog has no such song"""
+        row = int(np.searchsorted(self.song_ids, song_id))
+        if row < len(self) and self.song_ids[row] == song_id:
+            return row
+        return None
+
+    def resolve_genres(self, names):
+        """Map each distinct normalized genre name to its (column, bitset row), None where unknown.
+
+        A batch resolves the genres of all its queries once and passes the
+        result to each ranking as `resolved`.
+        """
+        return {key: (self.genre_lookup.get(key), self.genre_bitset_rows.get(key))
+                for key in {normalize_genre(name) for name in names}}
+
+    def _resolved(self, names, resolved):
+        """(column, bitset row) of each name, from resolved where it has the name"""
+        missing = [name for name in names if normalize_genre(name) not in resolved] if resolved else names
+        if missing:
+            resolved = dict(resolved or {})
+            resolved.update(self.resolve_genres(missing))
+        return [resolved[normalize_genre(name)] for name in names]
+
+    def genre_columns(self, names, resolved=None):
+        """Resolve genre names to catalog columns, skipping unknown genres"""
+        return [column for column, _ in self._resolved(names, resolved) if column is not None]
+
+    def song_genres(self, row, columns=None):
+        """Comma separated genre names of a song, optionally limited to columns"""
+        song_columns = self.genre_indices[self.genre_indptr[row]:self.genre_indptr[row + 1]]
+        names = [self.genre_names[c] for c in song_columns if columns is None or c in columns]
+        if not names:
+            return None
+        return ','.join(sorted(set(names), key=str.lower))
+
+    def song_arrangements(self, row):
+        """Comma separated arrangement icon filenames of a song"""
+        song_columns = self.arrangement_indices[self.arrangement_indptr[row]:self.arrangement_indptr[row + 1]]
+        icons = {self.arrangement_icons[c] for c in song_columns if self.arrangement_icons[c]}
+        if not icons:
+            return None
+        return ','.join(sorted(icons))
+
+    def song_row(self, row, columns=None):
+        """Output fields for a song row, matching the legacy result table"""
+        return {
+            'id': int(self.song_ids[row]),
+            'title': self.titles[row],
+            'artist': self.artists[row],
+            'genres': self.song_genres(row, columns),
+            'arrangements': self.song_arrangements(row),
+        }
+
+    def weighted_fragment(self, row, score, columns):
+        """UTF-8 JSON of a weighted search result, genres limited to columns"""
+        genres = self.song_genres(row, columns)
+        return b''.join((
+            self.fragment_heads.encoded(row),
+            b'"genre_score":', _encode_json(float(score)).encode(),
+            b',"genres":', _encode_json(genres).encode(),
+            b',"id":%d' % self.song_ids[row],
+            self.fragment_tails.encoded(row),
+        ))
+
+    def band_fragment(self, row, score):
+        """UTF-8 JSON of a band search result"""
+        return b''.join((
+            self.fragment_heads.encoded(row),
+            b'"genres":', self.fragment_genres.encoded(row),
+            b',"id":%d' % self.song_ids[row],
+            b',"match_score":', _encode_json(float(score)).encode(),
+            self.fragment_tails.encoded(row),
+        ))
+
+    def filter_rows(self, rows, filters):
+        """Keep the candidate rows that pass the search filters"""
+        if filters.get('region'):
+            column = self.region_lookup.get(filters['region'].strip().upper())
+            if column is None:
+                raise InvalidSearch(f"Unknown region {filters['region']}")
+            rows = rows[_test_bits(self.region_bitsets[column], rows)]
+
+        if filters.get('arrangements'):
+            wanted = np.zeros(self.arrangement_masks.shape[1], dtype=np.uint64)
+            for name in filters['arrangements']:
+                column = self.arrangement_lookup.get(name.strip().lower())
+                if column is None:
+                    raise InvalidSearch(f"Unknown arrangement {name}")
+                wanted[column // 64] |= np.uint64(1) << np.uint64(column % 64)
+            rows = rows[self.has_arrangements(rows, wanted, filters.get('arrangementMatch') == 'all')]
+        return rows
+
+    def has_arrangements(self, rows, wanted, match_all=True):
+        """Whether each of rows offers all (or any) of the arrangements in the wanted mask words"""
+        matched = self.arrangement_masks[rows] & wanted
+        if match_all:
+            return (matched == wanted).all(axis=1)
+        return (matched != 0).any(axis=1)
+
+    def rank_weighted(self, weights, limit, filters=None, resolved=None):
+        """Rank songs by the sum of their genre weights.
+
+        weights is a list of (genre name, weight) pairs; the first weight
+        given for a genre wins, as it did with the SQL CASE expression.
+        resolved optionally holds genres already looked up by resolve_genres.
+        Returns (rows, scores) ordered by score descending, then song id.
+        """
+        weight_vector = np.zeros(len(self.genre_names), dtype=np.float64)
+        assigned = np.zeros(len(self.genre_names), dtype=bool)
+        for name, weight in weights:
+            for column in self.genre_columns([name], resolved):
+                if not assigned[column]:
+                    weight_vector[column] = float(weight)
+                    assigned[column] = True
+
+        # Sparse song x genre matrix times the weight vector
+        scores = np.bincount(self.genre_rows, weights=weight_vector[self.genre_indices],
+                             minlength=len(self))
+        scores *= self.arrangement_counts
+
+        # Only songs with a positive score qualify, and those always carry a requested genre
+        rows = np.flatnonzero(scores > 0)
+        if filters:
+            rows = self.filter_rows(rows, filters)
+        return self._top_k(rows, scores, self.song_ids, limit)
+
+    def _top_k(self, rows, scores, tie_keys, limit):
+        """Pick the best `limit` rows by score descending, then tie_keys ascending.
+
+        Uses a partial selection so only the winners and anything tied with
+        the last winner get fully sorted. A limit of zero or less selects nothing.
+        """
+        if limit <= 0:
+            rows = rows[:0]
+        elif len(rows) > limit:
+            candidate_scores = scores[rows]
+            kth = np.argpartition(-candidate_scores, limit - 1)[limit - 1]
+            rows = rows[candidate_scores >= candidate_scores[kth]]
+        order = np.lexsort((tie_keys[rows], -scores[rows]))[:limit]
+        rows = rows[order]
+        return rows, scores[rows]
+
+    def rank_band_genres(self, genres, limit, filters=None, resolved=None):
+        """Rank songs by how many of the given genres they are tagged with.
+
+        resolved optionally holds genres already looked up by resolve_genres.
+        Returns (rows, scores) ordered by match count descending, then title.
+        """
+        keys = list(dict.fromkeys(normalize_genre(g) for g in genres))
+        bitsets = [self.genre_bitsets[bitset_row] for _, bitset_row in self._resolved(keys, resolved)
+                   if bitset_row is not None]
+
+        # Add the bitsets word-wise into bit-sliced counters (plane i holds bit i
+        # of every song's match count), so the work scales with the number of
+        # requested genres rather than the number of songs tagged with them
+        planes = []
+        for carry in bitsets:
+            for i, plane in enumerate(planes):
+                planes[i] = plane ^ carry
+                carry = plane & carry
+            if carry.any():
+                planes.append(carry)
+
+        scores = np.zeros(len(self), dtype=np.float64)
+        for i, plane in enumerate(planes):
+            scores += _unpack_bitset(plane, len(self)) * float(1 << i)
+
+        rows = np.flatnonzero(scores > 0)
+        if filters:
+            rows = self.filter_rows(rows, filters)
+        return self._top_k(rows, scores, self.title_rank, limit)
+
+
+def load_catalog(connection):
+    """Load the catalog tables from the database into a Catalog"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT id, title, artist, album FROM songs ORDER BY id")
+        songs = cursor.fetchall()
+        song_ids = np.array([s[0] for s in songs], dtype=np.int64)
+        titles = [s[1] or '' for s in songs]
+        artists = [s[2] or '' for s in songs]
+        albums = [s[3] or '' for s in songs]
+
+        cursor.execute("SELECT id, genre_name FROM genres ORDER BY id")
+        genres = cursor.fetchall()
+        genre_ids = np.array([g[0] for g in genres], dtype=np.int64)
+        genre_names = [g[1] or '' for g in genres]
+
+        cursor.execute("SELECT id, arrangement_name FROM arrangements ORDER BY id")
+        arrangements = cursor.fetchall()
+        arrangement_ids = np.array([a[0] for a in arrangements], dtype=np.int64)
+        arrangement_names = [a[1] or '' for a in arrangements]
+
+        cursor.execute("SELECT id, region_code FROM regions ORDER BY id")
+        regions = cursor.fetchall()
+        region_ids = np.array([r[0] for r in regions], dtype=np.int64)
+        region_codes = [r[1] or '' for r in regions]
+
+        cursor.execute("SELECT song_id, genre_id FROM song_genres")
+        song_genre_links = _link_positions(cursor.fetchall(), song_ids, genre_ids)
+
+        cursor.execute("SELECT song_id, arrangement_id FROM song_arrangements")
+        song_arrangement_links = _link_positions(cursor.fetchall(), song_ids, arrangement_ids)
+
+        cursor.execute("SELECT song_id, region_id FROM song_regions")
+        song_region_links = _link_positions(cursor.fetchall(), song_ids, region_ids)
+    finally:
+        cursor.close()
+
+    catalog = Catalog.build(song_ids, titles, artists, albums, genre_names, song_genre_links,
+                            arrangement_names, song_arrangement_links, region_codes, song_region_links,
+                            version=datetime.now().strftime('%Y%m%d-%H%M%S-%f'))
+    logger.info(f"Loaded catalog: {len(catalog)} songs, {len(genre_names)} genres, "
+                f"{len(arrangement_names)} arrangements, {len(region_codes)} regions")
+    return catalog
+
+
+def _link_positions(links, song_ids, lookup_ids):
+    """Convert (song_id, lookup_id) rows to (song row, lookup column) arrays"""
+    links = np.array(links, dtype=np.int64).reshape(-1, 2)
+    rows = _map_ids(links[:, 0], song_ids)
+    cols = _map_ids(links[:, 1], lookup_ids)
+    keep = (rows >= 0) & (cols >= 0)
+    return rows[keep], cols[keep]
+
+
+def add_reload_listener(listener):
+    """Call listener(new_catalog) after a reloaded catalog is swapped in"""
+    _reload_listeners.append(listener)
+
+
+def _current_snapshot_stamp():
+    """Identity of the snapshot file on disk, None if there is none"""
+    return file_stamp(SNAPSHOT_PATH)
+
+
+def _rss_bytes():
+    """Resident set size of this process, 0 where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def get_catalog():
+    """Return this worker's catalog, loading it on first use.
+
+    The snapshot file is preferred; without one the catalog is loaded
+    from the database. Once loaded, a newer snapshot file is picked up in
+    the background (see _reload_snapshot).
+    """
+    global _catalog, _snapshot_stamp
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                stamp = _current_snapshot_stamp()
+                if stamp is not None:
+                    try:
+                        with stage('snapshot_open'):
+                            _catalog = Catalog.open_snapshot(SNAPSHOT_PATH)
+                        _snapshot_stamp = stamp
+                        logger.info(f"Opened catalog snapshot {_catalog.version}: {len(_catalog)} songs")
+                    except SnapshotError as e:
+                        # e.g. a snapshot written by an older release; rebuild it with the populate script
+                        logger.warning(f"Ignoring catalog snapshot: {e}")
+            if _catalog is None:
+                connection = get_db_connection()
+                if connection is None:
+                    return None
+                with connection:
+                    with stage('catalog_load'):
+                        _catalog = load_catalog(connection)
+    else:
+        _check_for_reload()
+    return _catalog
+
+
+def _check_for_reload():
+    """Start a background reload if the snapshot file changed since it was opened"""
+    global _next_reload_check, _reloading
+    now = time.monotonic()
+    if now < _next_reload_check or _reloading:
+        return
+    with _catalog_lock:
+        if now < _next_reload_check or _reloading:
+            return
+        _next_reload_check = now + RELOAD_INTERVAL
+        stamp = _current_snapshot_stamp()
+        if stamp is None or stamp == _snapshot_stamp:
+            return
+        _reloading = True
+    threading.Thread(target=_reload_snapshot, args=(stamp,), name='catalog-reload', daemon=True).start()
+
+
+def _reload_snapshot(stamp):
+    """Open the new snapshot and swap it in.
+
+    Requests already running keep their reference to the old catalog and
+    finish on it; its memory map is released once they are done.
+    """
+    global _catalog, _snapshot_stamp, _reloading
+    started = time.perf_counter()
+    rss_before = _rss_bytes()
+    try:
+        with stage('snapshot_open'):
+            catalog = Catalog.open_snapshot(SNAPSHOT_PATH)
+        old_version = _catalog.version if _catalog is not None else None
+        _catalog = catalog
+        _snapshot_stamp = stamp
+        for listener in _reload_listeners:
+            listener(catalog)
+        logger.info(f"Reloaded catalog {old_version} -> {catalog.version} ({len(catalog)} songs) "
+                    f"in {(time.perf_counter() - started) * 1000:.1f} ms, "
+                    f"RSS {(_rss_bytes() - rss_before) / 1024 / 1024:+.1f} MB")
+    except Exception as e:
+        logger.error(f"Catalog reload failed: {e}")
+    finally:
+        _reloading = False
@@ -0,0 +1,172 @@
+"""Read-only binary catalog snapshot files.
+
+Layout: an 8 byte magic, a uint32 format version and a uint32 header
+length, then a JSON header describing every array, then the array data,
+each array aligned to 64 bytes. Strings are stored as one UTF-8 blob plus
+an int64 offsets array.
+
+Readers memory-map the file and wrap it in zero-copy numpy views, so every
+worker process shares one physical copy through the page cache.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RSCATLG\0'
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated or of another format"""
+
+
+class StringTable:
+    """Sequence of strings stored as a UTF-8 blob plus offsets into it"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [(s or '').encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('string table index out of range')
+        return self.encoded(index).decode('utf-8')
+
+    def encoded(self, index):
+        """The UTF-8 bytes of one string, without decoding"""
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes()
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def file_stamp(path):
+    """Identity of the file at path as (inode, mtime, size), None if there is none"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class VersionedFile:
+    """A file built for one catalog version, reopened whenever it changes on disk"""
+
+    def __init__(self, opener, description):
+        self.opener = opener
+        self.description = description
+        self.loaded = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def get(self, path, catalog):
+        """opener(path) built for catalog's version, None if there is none.
+
+        A file rebuilt alongside a new catalog snapshot is picked up with it;
+        one that fails to open is logged and ignored until it changes again.
+        """
+        stamp = file_stamp(path)
+        if stamp is None:
+            return None
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    try:
+                        self.loaded = self.opener(path)
+                    except (OSError, SnapshotError) as e:
+                        logger.warning(f"Ignoring {self.description}: {e}")
+                        self.loaded = None
+                    self._stamp = stamp
+        loaded = self.loaded
+        if loaded is None or loaded.catalog_version != catalog.version:
+            return None
+        return loaded
+
+
+def write_snapshot(path, version, arrays, strings):
+    """Write arrays and string lists to path, replacing it atomically"""
+    columns = dict(arrays)
+    for name, values in strings.items():
+        table = values if isinstance(values, StringTable) else StringTable.from_strings(values)
+        columns[f'{name}.offsets'] = table.offsets
+        columns[f'{name}.blob'] = table.blob
+
+    layout = {}
+    offset = 0
+    for name, array in columns.items():
+        array = np.ascontiguousarray(array)
+        columns[name] = array
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({
+        'version': version,
+        'arrays': layout,
+        'strings': list(strings),
+    }).encode('utf-8')
+    data_start = -(-(_PREAMBLE.size + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    # Write next to the target and rename, so readers never see a partial file
+    # and processes that still map the old snapshot keep a valid copy
+    temp_path = f'{path}.tmp{os.getpid()}'
+    with open(temp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in columns.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path):
+    """Map a snapshot file, returning (version, arrays, strings, mmap)"""
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise SnapshotError(f"{path} is empty")
+
+    if len(mapped) < _PREAMBLE.size:
+        raise SnapshotError(f"{path} is too short to be a catalog snapshot")
+    magic, format_version, header_length = _PREAMBLE.unpack_from(mapped, 0)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} catalog snapshot")
+    header = json.loads(mapped[_PREAMBLE.size:_PREAMBLE.size + header_length].decode('utf-8'))
+    data_start = -(-(_PREAMBLE.size + header_length) // ALIGNMENT) * ALIGNMENT
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        start = data_start + spec['offset']
+        if start + count * dtype.itemsize > len(mapped):
+            raise SnapshotError(f"{path} is truncated")
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=start).reshape(spec['shape'])
+
+    strings = {}
+    for name in header['strings']:
+        strings[name] = StringTable(arrays.pop(f'{name}.offsets'), arrays.pop(f'{name}.blob'))
+    return header['version'], arrays, strings, mapped
@@ -1,21 +1,181 @@
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
+from collections import deque
 import os
+import threading
+import weakref
+from .metrics import stage
+from .query_profiler import profile_connection
 
 load_dotenv()
 
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection frees up within the pool timeout"""
+
+
+class PooledConnection:
+    """Wraps a pooled MySQL connection; close() hands it back to the pool.
+
+    Use it as a context manager to close it on every path. A connection
+    dropped without close() still gives its slot back when it is garbage
+    collected, so a missed close() cannot leak the slot for good.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self._finalizer = weakref.finalize(self, pool.release, connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise Error("Connection has already been returned to the pool")
+        return getattr(self._connection, name)
+
+    def is_connected(self):
+        return self._connection is not None and self._connection.is_connected()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection = None
+            # Runs pool.release(connection) at most once
+            self._finalizer()
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections with bounded checkout waits.
+
+    The pool remembers the process that created its connections. A forked
+    worker drops the inherited idle connections rather than sharing their
+    sockets with the parent.
+    """
+
+    def __init__(self, connect, size=5, timeout=10.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.created = 0
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def get(self):
+        """Check out a healthy connection, waiting at most `timeout` seconds"""
+        self._check_pid()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise PoolTimeoutError(
+                    f"Timed out after {self.timeout}s waiting for a database connection "
+                    f"(pool size {self.size})")
+
+        try:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+                self.checkouts += 1
+
+            if connection is None:
+                connection = self._connect()
+                with self._lock:
+                    self.created += 1
+            elif not self._healthy(connection):
+                connection.reconnect(attempts=1)
+                with self._lock:
+                    self.reconnects += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+        return PooledConnection(self, connection)
+
+    def _healthy(self, connection):
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def release(self, connection):
+        """Return a connection to the pool"""
+        if self._pid != os.getpid():
+            # Checked out before a fork; the slot belongs to the old pool
+            return
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            with self._lock:
+                self._idle.append(connection)
+        except Error:
+            # Drop a broken connection; a fresh one is opened on a later checkout
+            pass
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'reconnects': self.reconnects,
+                'created': self.created,
+            }
+
+
+def _connect():
+    return mysql.connector.connect(
+        host=os.getenv('DATABASE_URL'),
+        database=os.getenv('DATABASE_NAME'),
+        user=os.getenv('DATABASE_USERNAME'),
+        password=os.getenv('DATABASE_PASSWORD'),
+        port=os.getenv('DATABASE_PORT'),
+        charset='utf8mb4'
+    )
+
+_pool = ConnectionPool(
+    _connect,
+    size=int(os.getenv('DATABASE_POOL_SIZE', 5)),
+    timeout=float(os.getenv('DATABASE_POOL_TIMEOUT', 10))
+)
+
+def get_pool_stats():
+    """Counters for the connection pool"""
+    return _pool.stats()
+
 def get_db_connection():
+    """Check out a pooled connection; close() it, or use it in a with block, to give it back.
+
+    Returns None if a new connection cannot be opened, and raises
+    PoolTimeoutError if the pool stays exhausted for DATABASE_POOL_TIMEOUT.
+    """
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DATABASE_URL'),
-            database=os.getenv('DATABASE_NAME'),
-            user=os.getenv('DATABASE_USERNAME'),
-            password=os.getenv('DATABASE_PASSWORD'),
-            port=os.getenv('DATABASE_PORT'),
-            charset='utf8mb4'
-        )
-        return connection
+        with stage('db_connect'):
+            return profile_connection(_pool.get())
     except Error as e:
         print(f"Error connecting to MySQL Database: {e}")
-        return None
\ No newline at end of file
+        return None
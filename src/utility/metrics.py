@@ -0,0 +1,133 @@
+"""Per-request stage timing and in-process latency histograms.
+
+Wrap a unit of work in `with stage('rank'):` to time it. Inside a request
+the duration is added to the response's Server-Timing header and to the
+histogram for (route, stage). Outside a request, e.g. a background catalog
+reload, it is recorded under the route "background". Each observation is
+one perf_counter pair, one bisect and one short lock.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+
+# Upper bounds in seconds, as in the Prometheus client defaults plus sub-millisecond buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class StageMetrics:
+    """Histograms keyed by (route, stage)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, route, stage_name, seconds):
+        with self._lock:
+            histogram = self._histograms.get((route, stage_name))
+            if histogram is None:
+                histogram = self._histograms[(route, stage_name)] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """Copy of every histogram as {(route, stage): (counts, sum, count)}"""
+        with self._lock:
+            return {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+
+
+_metrics = StageMetrics()
+
+
+def get_stage_metrics():
+    return _metrics
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as one stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if has_request_context():
+            timings = g.setdefault('stage_timings', [])
+            timings.append((name, elapsed))
+            _metrics.observe(_route(), name, elapsed)
+        else:
+            _metrics.observe('background', name, elapsed)
+
+
+def init_app(app):
+    """Time every request and add a Server-Timing header to the response"""
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _server_timing(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        _metrics.observe(_route(), 'total', total)
+        entries = [f'{name};dur={elapsed * 1000:.2f}' for name, elapsed in g.get('stage_timings', [])]
+        entries.append(f'total;dur={total * 1000:.2f}')
+        response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(gauges=None):
+    """Prometheus text exposition of the stage histograms.
+
+    gauges maps a metric family name to (help text, value or {label: value},
+    label name) and is appended after the histograms.
+    """
+    lines = [
+        '# HELP app_stage_duration_seconds Time spent in each stage of a request',
+        '# TYPE app_stage_duration_seconds histogram',
+    ]
+    for (route, stage_name), (counts, total, count) in sorted(_metrics.snapshot().items()):
+        labels = f'route="{_escape(route)}",stage="{_escape(stage_name)}"'
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, counts):
+            cumulative += bucket_count
+            lines.append(f'app_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'app_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f'app_stage_duration_seconds_sum{{{labels}}} {total}')
+        lines.append(f'app_stage_duration_seconds_count{{{labels}}} {count}')
+
+    for name, (help_text, values, label) in (gauges or {}).items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        if isinstance(values, dict):
+            for key, value in values.items():
+                lines.append(f'{name}{{{label}="{_escape(key)}"}} {value}')
+        else:
+            lines.append(f'{name} {values}')
+    return '\n'.join(lines) + '\n'
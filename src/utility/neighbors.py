@@ -0,0 +1,185 @@
+"""Precomputed "songs like this" neighbor index.
+
+Similarity is the cosine of two songs' genre sets, |A & B| / sqrt(|A| |B|).
+Songs with an identical genre set share a profile, and the build compares
+profiles rather than songs. Only profiles that share a genre are compared,
+so the cost follows the number of distinct profiles, not songs squared.
+
+Each song keeps its top K neighbors: first the other songs of its own
+profile, then songs of the closest other profiles. Ties are spread by
+starting each song's pick just after itself, so songs of one profile do not
+all get the same neighbors.
+
+The index is a snapshot file (see catalog_snapshot) next to the catalog
+snapshot, tagged with the catalog version it was built from. Rebuild it
+from the current catalog snapshot with:
+
+    python -m src.utility.neighbors [--k 50]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from .catalog_snapshot import SnapshotError, VersionedFile, read_snapshot, write_snapshot
+
+NEIGHBORS_PATH = os.getenv('NEIGHBORS_SNAPSHOT',
+                           os.path.join(os.path.dirname(__file__), '..', '..', 'neighbors.snapshot'))
+DEFAULT_K = 50
+
+
+def _profiles(catalog):
+    """Group songs by genre set; returns (profile per song row, genre columns per profile)"""
+    profile_ids = {}
+    song_profiles = np.empty(len(catalog), dtype=np.int64)
+    for row in range(len(catalog)):
+        genres = tuple(catalog.genre_indices[catalog.genre_indptr[row]:catalog.genre_indptr[row + 1]].tolist())
+        song_profiles[row] = profile_ids.setdefault(genres, len(profile_ids))
+    return song_profiles, list(profile_ids)
+
+
+def build_neighbors(catalog, k=DEFAULT_K):
+    """Top-k neighbor rows and cosine scores per song, padded with -1 / 0"""
+    n_songs = len(catalog)
+    neighbor_rows = np.full((n_songs, k), -1, dtype=np.int32)
+    neighbor_scores = np.zeros((n_songs, k), dtype=np.float32)
+    if n_songs == 0 or k == 0:
+        return neighbor_rows, neighbor_scores
+
+    song_profiles, profile_genres = _profiles(catalog)
+    n_profiles = len(profile_genres)
+    sizes = np.array([len(genres) for genres in profile_genres], dtype=np.float64)
+
+    # Songs of each profile in row order, and profiles carrying each genre
+    songs_by_profile = np.split(np.argsort(song_profiles, kind='stable').astype(np.int32),
+                                np.cumsum(np.bincount(song_profiles, minlength=n_profiles))[:-1])
+    profiles_by_genre = [[] for _ in range(len(catalog.genre_names))]
+    for profile, genres in enumerate(profile_genres):
+        for genre in genres:
+            profiles_by_genre[genre].append(profile)
+    profiles_by_genre = [np.array(profiles, dtype=np.int64) for profiles in profiles_by_genre]
+
+    for profile, genres in enumerate(profile_genres):
+        songs = songs_by_profile[profile]
+        if not genres:
+            # Untagged songs are similar to nothing
+            continue
+
+        # Shared genre counts with every profile that has one of these genres
+        others, shared = np.unique(np.concatenate([profiles_by_genre[genre] for genre in genres]),
+                                   return_counts=True)
+        keep = others != profile
+        others = others[keep]
+        cosine = shared[keep] / np.sqrt(sizes[others] * len(genres))
+
+        # Every profile adds at least one song, so at most k profiles are needed:
+        # those above the k-th best cosine plus the lowest ids tied with it.
+        # others is in id order, so a stable sort keeps ties in id order.
+        candidates = np.arange(len(others))
+        if len(others) > k:
+            kth = np.partition(cosine, len(cosine) - k)[len(cosine) - k]
+            above = np.flatnonzero(cosine > kth)
+            candidates = np.concatenate([above, np.flatnonzero(cosine == kth)[:k - len(above)]])
+        order = candidates[np.argsort(-cosine[candidates], kind='stable')]
+
+        # Songs of the closest other profiles, enough to fill k slots
+        fill_rows, fill_scores = [], []
+        needed = k
+        for i in order:
+            if needed <= 0:
+                break
+            picked = songs_by_profile[others[i]][:needed]
+            fill_rows.append(picked)
+            fill_scores.append(np.full(len(picked), cosine[i]))
+            needed -= len(picked)
+
+        # Own profile first (cosine 1), each song starting just after itself
+        own = min(k, len(songs) - 1)
+        positions = np.arange(len(songs))[:, None] + np.arange(1, own + 1)
+        neighbor_rows[songs, :own] = songs[positions % len(songs)]
+        neighbor_scores[songs, :own] = 1.0
+        if fill_rows:
+            fill_rows = np.concatenate(fill_rows)[:k - own]
+            fill_scores = np.concatenate(fill_scores)[:k - own]
+            neighbor_rows[songs, own:own + len(fill_rows)] = fill_rows
+            neighbor_scores[songs, own:own + len(fill_rows)] = fill_scores
+
+    return neighbor_rows, neighbor_scores
+
+
+class NeighborIndex:
+    """Memory-mapped neighbor arrays for one catalog version"""
+
+    def __init__(self, catalog_version, rows, scores, mapped=None):
+        self.catalog_version = catalog_version
+        self.rows = rows
+        self.scores = scores
+        self._mapped = mapped
+
+    def neighbors(self, row):
+        """(rows, scores) of a song's stored neighbors, best first"""
+        rows = self.rows[row]
+        found = rows >= 0
+        return rows[found], self.scores[row][found]
+
+
+def rank_similar(catalog, row, limit, required_mask=None):
+    """Live top-limit (rows, cosines) for one song among songs offering every arrangement of required_mask.
+
+    Used when a filter leaves too few of the stored neighbors. Ties are
+    broken by row, i.e. song id.
+    """
+    genres = catalog.genre_indices[catalog.genre_indptr[row]:catalog.genre_indptr[row + 1]]
+    if len(genres) == 0 or limit <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    weight_vector = np.zeros(len(catalog.genre_names), dtype=np.float64)
+    weight_vector[genres] = 1.0
+    shared = np.bincount(catalog.genre_rows, weights=weight_vector[catalog.genre_indices],
+                         minlength=len(catalog))
+    shared[row] = 0
+    candidates = np.flatnonzero(shared > 0)
+    if required_mask is not None and required_mask.any():
+        candidates = candidates[catalog.has_arrangements(candidates, required_mask)]
+
+    sizes = np.diff(catalog.genre_indptr)[candidates]
+    cosine = shared[candidates] / np.sqrt(sizes * float(len(genres)))
+    order = np.lexsort((candidates, -cosine))[:limit]
+    return candidates[order], cosine[order]
+
+
+def write_neighbors(catalog, path=NEIGHBORS_PATH, k=DEFAULT_K):
+    """Build the neighbor index for catalog and write it to path"""
+    rows, scores = build_neighbors(catalog, k)
+    write_snapshot(path, catalog.version, {'rows': rows, 'scores': scores}, {})
+
+
+def open_neighbors(path=NEIGHBORS_PATH):
+    version, arrays, _, mapped = read_snapshot(path)
+    if 'rows' not in arrays or 'scores' not in arrays:
+        raise SnapshotError(f"{path} is not a neighbor index")
+    return NeighborIndex(version, arrays['rows'], arrays['scores'], mapped)
+
+
+_index = VersionedFile(open_neighbors, 'neighbor index')
+
+
+def get_neighbor_index(catalog):
+    """The neighbor index built for catalog's version, None if there is none"""
+    return _index.get(NEIGHBORS_PATH, catalog)
+
+
+def main():
+    from .catalog import SNAPSHOT_PATH, Catalog
+
+    parser = argparse.ArgumentParser(description="Build the similar songs index from the catalog snapshot")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help="neighbors kept per song")
+    args = parser.parse_args()
+
+    catalog = Catalog.open_snapshot(SNAPSHOT_PATH)
+    started = time.perf_counter()
+    write_neighbors(catalog, k=args.k)
+    print(f"Neighbor index for catalog {catalog.version} ({len(catalog)} songs, k={args.k}) "
+          f"written to {NEIGHBORS_PATH} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import json
+import numpy as np
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from .catalog import int_field
+
+
+class InvalidPageToken(ValueError):
+    """Raised when a page token is tampered with or belongs to another search"""
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='recommendation-page')
+
+
+def encode_page_token(query_key, score, song_id, page, title=None):
+    """Signed continuation token for the page after (score, song_id), or (score, title, song_id)"""
+    payload = {'q': query_key, 's': float(score), 'i': int(song_id), 'p': int(page)}
+    if title is not None:
+        payload['t'] = title
+    return _serializer().dumps(payload)
+
+
+def decode_page_token(token, query_key):
+    """Return (score, song_id, title, page) from a token issued for query_key; title may be None"""
+    if not current_app.secret_key:
+        raise InvalidPageToken("Page tokens are disabled without a SECRET_KEY")
+    try:
+        payload = _serializer().loads(token)
+    except BadSignature:
+        raise InvalidPageToken("Invalid page token")
+    if payload.get('q') != query_key:
+        raise InvalidPageToken("Page token does not match this search")
+    return payload['s'], payload['i'], payload.get('t'), payload['p']
+
+
+def _title_key(catalog, row):
+    """Title part of the band ranking's tie-break, as Catalog.build orders title_rank"""
+    return (catalog.titles[row] or '').lower()
+
+
+def _resume_offset(catalog, rows, scores, last_score, last_id, last_title):
+    """Offset of the first row ranked strictly after (last_score, tie-break).
+
+    Rankings are ordered by score descending, then by song id (weighted) or
+    by lower-cased title and song id (bands, when last_title is given).
+    """
+    after = scores < last_score
+    tied = np.flatnonzero(scores == last_score)
+    if last_title is None:
+        after[tied] = catalog.song_ids[rows[tied]] > last_id
+    else:
+        last_key = (last_title, last_id)
+        after[tied] = [(_title_key(catalog, row), int(catalog.song_ids[row])) > last_key for row in rows[tied]]
+    following = np.flatnonzero(after)
+    return int(following[0]) if len(following) else len(rows)
+
+
+def is_first_page(data):
+    """Whether a request starts a search rather than continuing one"""
+    return not data.get('pageToken') and str(data.get('page', 1)).strip() == '1'
+
+
+def resolve_page(catalog, query_key, rows, scores, data, per_page):
+    """Work out (start offset, page number) for a request.
+
+    A pageToken continues after the last song it saw, identified by its
+    score and the ranking's tie-break, so it stays valid on any worker and
+    even if the ranking was rebuilt meanwhile. Without a token the plain
+    page number is used.
+    """
+    token = data.get('pageToken')
+    if not token:
+        page = int_field(data, 'page', 1, minimum=1)
+        return (page - 1) * per_page, page
+
+    last_score, last_id, last_title, page = decode_page_token(token, query_key)
+    position = np.flatnonzero(catalog.song_ids[rows] == last_id)
+    if len(position):
+        return int(position[0]) + 1, page
+    # The song dropped out of the ranking; resume at the first song ranked after it
+    return _resume_offset(catalog, rows, scores, last_score, last_id, last_title), page
+
+
+def page_envelope(catalog, query_key, rows, scores, songs, start, page, per_page, by_title=False):
+    """Response body for one page of a ranked result; songs are pre-encoded JSON fragments.
+
+    by_title marks rankings whose ties are broken by title (band searches).
+    """
+    total = len(rows)
+    total_pages = (total + per_page - 1) // per_page
+    end = start + len(songs)
+    body = {
+        'songs': songs,
+        'total': total,
+        'currentPage': page,
+        'totalPages': total_pages,
+        'hasMore': end < total
+    }
+    if end < total and songs and current_app.secret_key:
+        last = rows[end - 1]
+        body['nextToken'] = encode_page_token(query_key, scores[end - 1], catalog.song_ids[last], page + 1,
+                                              _title_key(catalog, last) if by_title else None)
+    return body
+
+
+def paged_body(catalog, query_key, rows, scores, fragment, data, per_page, by_title=False):
+    """page_envelope for the page a request asks for; fragment(row, score) encodes each song"""
+    offset, page = resolve_page(catalog, query_key, rows, scores, data, per_page)
+    songs = [fragment(row, score)
+             for row, score in zip(rows[offset:offset + per_page], scores[offset:offset + per_page])]
+    return page_envelope(catalog, query_key, rows, scores, songs, offset, page, per_page, by_title)
+
+
+def encode_body(body):
+    """UTF-8 JSON of a page_envelope body with keys in sorted order like jsonify.
+
+    The song fragments are spliced in as they are.
+    """
+    parts = []
+    for key in sorted(body):
+        value = b'[' + b','.join(body[key]) + b']' if key == 'songs' else json.dumps(body[key]).encode()
+        parts.append(json.dumps(key).encode() + b':' + value)
+    return b'{' + b','.join(parts) + b'}'
+
+
+def page_response(body):
+    """JSON response for a page_envelope body"""
+    return current_app.response_class(encode_body(body) + b'\n', mimetype='application/json')
@@ -0,0 +1,185 @@
+"""Precomputed rankings for the most common recommendation searches.
+
+Most searches are one or two genres at default weights. The populate
+pipeline ranks the top TABLE_LIMIT songs of every single genre, in both
+weighted and band mode, plus the most frequent unfiltered genre
+combinations of the query log, and stores them in a snapshot file (see
+catalog_snapshot) tagged with the catalog version.
+
+A single-genre weighted ranking is stored at weight 1: any positive weight
+scales every score alike, so the order is the same and the scores are the
+stored ones times the weight. Rankings are ordered, so a shorter request is
+a prefix of the stored list. Filtered searches, and anything not in the
+table, are ranked live by the catalog.
+
+Rebuild the table from the current catalog snapshot with:
+
+    python -m src.utility.precomputed [--combos 200]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+from .catalog_snapshot import SnapshotError, VersionedFile, read_snapshot, write_snapshot
+from .query_log import QUERY_LOG_PATH, popular_queries, read_query_log
+from .result_cache import canonical_band_genres, canonical_weights
+
+RANKINGS_PATH = os.getenv('RANKINGS_SNAPSHOT',
+                          os.path.join(os.path.dirname(__file__), '..', '..', 'rankings.snapshot'))
+TABLE_LIMIT = 500
+DEFAULT_COMBOS = 200
+
+_counter_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0}
+
+
+def _table_key(mode, genres):
+    return json.dumps([mode, genres], separators=(',', ':'))
+
+
+class RankingTable:
+    """Memory-mapped precomputed rankings for one catalog version"""
+
+    def __init__(self, catalog_version, keys, offsets, rows, scores, mapped=None):
+        self.catalog_version = catalog_version
+        self.offsets = offsets
+        self.rows = rows
+        self.scores = scores
+        self._mapped = mapped
+        self._index = {key: i for i, key in enumerate(keys)}
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, mode, genres, limit):
+        """(rows, scores) of the stored ranking cut to limit, None if it is not stored"""
+        i = self._index.get(_table_key(mode, genres))
+        if i is None:
+            return None
+        start = self.offsets[i]
+        end = min(self.offsets[i + 1], start + limit)
+        # Copies, so cached results do not pin the mapped file
+        return (self.rows[start:end].astype(np.int64),
+                self.scores[start:end].astype(np.float64))
+
+
+def table_queries(catalog, combos=()):
+    """(mode, canonical genres) of every ranking to precompute"""
+    queries = [('weighted', [[name, 1.0]]) for name in sorted(catalog.genre_lookup)]
+    queries += [('bands', [name]) for name in sorted(catalog.genre_bitset_rows)]
+    seen = {_table_key(mode, genres) for mode, genres in queries}
+    for mode, genres in combos:
+        if mode == 'weighted':
+            genres = [list(pair) for pair in canonical_weights(genres)]
+        else:
+            genres = canonical_band_genres(genres)
+        key = _table_key(mode, genres)
+        if len(genres) > 1 and key not in seen:
+            seen.add(key)
+            queries.append((mode, genres))
+    return queries
+
+
+def write_rankings(catalog, path=RANKINGS_PATH, combos=()):
+    """Rank every table query on catalog and write the table to path; returns the query count"""
+    queries = table_queries(catalog, combos)
+    offsets = np.zeros(len(queries) + 1, dtype=np.int64)
+    all_rows, all_scores = [], []
+    for i, (mode, genres) in enumerate(queries):
+        if mode == 'weighted':
+            rows, scores = catalog.rank_weighted(genres, TABLE_LIMIT)
+        else:
+            rows, scores = catalog.rank_band_genres(genres, TABLE_LIMIT)
+        all_rows.append(rows.astype(np.int32))
+        all_scores.append(scores)
+        offsets[i + 1] = offsets[i] + len(rows)
+
+    arrays = {
+        'offsets': offsets,
+        'rows': np.concatenate(all_rows) if all_rows else np.zeros(0, dtype=np.int32),
+        'scores': np.concatenate(all_scores) if all_scores else np.zeros(0, dtype=np.float64),
+    }
+    write_snapshot(path, catalog.version, arrays,
+                   {'keys': [_table_key(mode, genres) for mode, genres in queries]})
+    return len(queries)
+
+
+def open_rankings(path=RANKINGS_PATH):
+    version, arrays, strings, mapped = read_snapshot(path)
+    if 'keys' not in strings or any(name not in arrays for name in ('offsets', 'rows', 'scores')):
+        raise SnapshotError(f"{path} is not a rankings table")
+    return RankingTable(version, strings['keys'], arrays['offsets'], arrays['rows'], arrays['scores'], mapped)
+
+
+_table = VersionedFile(open_rankings, 'rankings table')
+
+
+def get_ranking_table(catalog):
+    """The rankings table built for catalog's version, None if there is none"""
+    return _table.get(RANKINGS_PATH, catalog)
+
+
+def _lookup(catalog, mode, genres, limit, filters):
+    table = None
+    if not filters and 0 <= limit <= TABLE_LIMIT and genres:
+        table = get_ranking_table(catalog)
+    found = None
+    if table is not None:
+        if mode == 'weighted' and len(genres) == 1:
+            genre, weight = genres[0]
+            if weight > 0:
+                found = table.get(mode, [[genre, 1.0]], limit)
+                if found is not None:
+                    found = (found[0], found[1] * weight)
+        else:
+            found = table.get(mode, genres, limit)
+    with _counter_lock:
+        _counters['hits' if found is not None else 'misses'] += 1
+    return found
+
+
+def rank_weighted(catalog, weights, limit, filters=None, resolved=None):
+    """Catalog.rank_weighted, answered from the rankings table when it holds the search"""
+    found = _lookup(catalog, 'weighted', [list(pair) for pair in canonical_weights(weights)], limit, filters)
+    if found is None:
+        found = catalog.rank_weighted(weights, limit, filters, resolved)
+    return found
+
+
+def rank_band_genres(catalog, genres, limit, filters=None, resolved=None):
+    """Catalog.rank_band_genres, answered from the rankings table when it holds the search"""
+    found = _lookup(catalog, 'bands', canonical_band_genres(genres), limit, filters)
+    if found is None:
+        found = catalog.rank_band_genres(genres, limit, filters, resolved)
+    return found
+
+
+def ranking_table_stats():
+    """Lookup counters of this worker and the size of the loaded table"""
+    with _counter_lock:
+        stats = dict(_counters)
+    table = _table.loaded
+    stats['entries'] = len(table) if table is not None else 0
+    return stats
+
+
+def main():
+    from .catalog import SNAPSHOT_PATH, Catalog
+
+    parser = argparse.ArgumentParser(description="Build the precomputed rankings table from the catalog snapshot")
+    parser.add_argument('--combos', type=int, default=DEFAULT_COMBOS,
+                        help="most frequent genre combinations of the query log to include")
+    parser.add_argument('--query-log', default=QUERY_LOG_PATH, help="query log to read combinations from")
+    args = parser.parse_args()
+
+    catalog = Catalog.open_snapshot(SNAPSHOT_PATH)
+    started = time.perf_counter()
+    count = write_rankings(catalog, combos=popular_queries(read_query_log(args.query_log), args.combos))
+    print(f"Rankings table for catalog {catalog.version} ({count} searches) "
+          f"written to {RANKINGS_PATH} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Log of normalized recommendation queries.
+
+One JSON object per line:
+
+    {"filters":{},"genres":[["rock",1.0]],"mode":"weighted","t":1760000000,"totalRequested":500}
+
+genres is the canonical form used for cache keys: sorted (genre, weight)
+pairs for weighted searches, sorted distinct genres for band searches.
+
+The endpoints append a sample of their new searches (QUERY_LOG_SAMPLE,
+default 0.1; 0 turns logging off); continuation pages are not logged. Each
+line is written with a single O_APPEND write, so concurrent workers never
+interleave lines. Past QUERY_LOG_MAX_BYTES (default 8 MB) the log is
+renamed to query_log.jsonl.1, so at most two files' worth is kept. New
+workers warm their caches with the most frequent recent queries (see
+warmup), and the populate pipeline picks the genre combinations worth
+precomputing.
+"""
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_PATH = os.getenv('QUERY_LOG',
+                           os.path.join(os.path.dirname(__file__), '..', '..', 'query_log.jsonl'))
+QUERY_LOG_SAMPLE = float(os.getenv('QUERY_LOG_SAMPLE', 0.1))
+MODES = ('weighted', 'bands')
+# The log moves to QUERY_LOG_PATH.1 past this size, replacing the previous one
+QUERY_LOG_MAX_BYTES = int(os.getenv('QUERY_LOG_MAX_BYTES', 8 * 1024 * 1024))
+# Longer lines could interleave with other workers' appends
+MAX_LINE_BYTES = 4096
+
+
+def log_query(mode, genres, total_requested, filters=None):
+    """Append a sample of normalized queries to the query log"""
+    if QUERY_LOG_SAMPLE <= 0 or random.random() >= QUERY_LOG_SAMPLE:
+        return
+    line = json.dumps({
+        't': int(time.time()),
+        'mode': mode,
+        'genres': genres,
+        'totalRequested': int(total_requested),
+        'filters': filters or {},
+    }, separators=(',', ':'), sort_keys=True).encode('utf-8') + b'\n'
+    if len(line) > MAX_LINE_BYTES:
+        return
+    try:
+        fd = os.open(QUERY_LOG_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            st = os.fstat(fd)
+        finally:
+            os.close(fd)
+        if st.st_size > QUERY_LOG_MAX_BYTES:
+            _rotate(st)
+    except OSError as e:
+        logger.warning(f"Could not write query log: {e}")
+
+
+def _rotate(written):
+    """Move the full log to QUERY_LOG_PATH.1, unless another worker already did"""
+    try:
+        current = os.stat(QUERY_LOG_PATH)
+    except FileNotFoundError:
+        return
+    if (current.st_dev, current.st_ino) == (written.st_dev, written.st_ino):
+        os.replace(QUERY_LOG_PATH, f'{QUERY_LOG_PATH}.1')
+
+
+def read_query_log(path=QUERY_LOG_PATH, tail_bytes=None):
+    """Yield the logged queries in path and its rotated predecessor, oldest first.
+
+    Lines that do not parse are skipped. tail_bytes limits reading to the
+    end of the log, i.e. recent queries.
+    """
+    remaining = tail_bytes
+    files = []
+    for name in (path, f'{path}.1'):
+        try:
+            size = os.path.getsize(name)
+        except OSError:
+            continue
+        skip = 0
+        if remaining is not None:
+            skip = max(size - remaining, 0)
+            remaining -= size - skip
+        files.insert(0, (name, skip))
+        if remaining is not None and remaining <= 0:
+            break
+    for name, skip in files:
+        yield from _read_entries(name, skip)
+
+
+def _read_entries(name, skip):
+    try:
+        log_file = open(name, 'rb')
+    except FileNotFoundError:
+        return
+    with log_file:
+        if skip:
+            log_file.seek(skip)
+            # Skip the partial line the tail starts in
+            log_file.readline()
+        for line in log_file:
+            try:
+                entry = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get('mode') in MODES and entry.get('genres'):
+                yield entry
+
+
+def _search(entry):
+    """Hashable (mode, genres, totalRequested, filters JSON) of a log entry, None if malformed"""
+    try:
+        if entry['mode'] == 'weighted':
+            genres = tuple((str(genre), float(weight)) for genre, weight in entry['genres'])
+        else:
+            genres = tuple(str(genre) for genre in entry['genres'])
+        filters = entry.get('filters') or {}
+        return (entry['mode'], genres, int(entry.get('totalRequested', 500)),
+                json.dumps(filters, sort_keys=True))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def popular_queries(entries, top):
+    """The top most frequent unfiltered (mode, genres) of entries, most frequent first"""
+    counts = Counter()
+    for entry in entries:
+        search = _search(entry)
+        if search is not None and search[3] == '{}':
+            counts[search[:2]] += 1
+    return [query for query, _ in counts.most_common(top)]
+
+
+def popular_searches(entries, top):
+    """The top most frequent (mode, genres, totalRequested, filters) of entries"""
+    counts = Counter(search for search in map(_search, entries) if search is not None)
+    return [(mode, genres, total, json.loads(filters))
+            for (mode, genres, total, filters), _ in counts.most_common(top)]
@@ -0,0 +1,236 @@
+"""Opt-in slow query capture.
+
+Set QUERY_PROFILE=1 to wrap database connections so every statement is
+timed. Each statement is logged at DEBUG with its parameters, duration and
+row count. Statements slower than SLOW_QUERY_MS (default 200) are also
+appended as JSON lines to QUERY_PROFILE_LOG, which rotates at 10 MB. A slow
+single SELECT, UPDATE or DELETE is followed by an EXPLAIN FORMAT=JSON,
+stored with it.
+
+mysql.connector cursors are unbuffered by default, which would leave the
+rows unread when execute() returns: the timing would miss the fetch and
+the EXPLAIN could not run on the connection. Profiled mysql.connector
+cursors are therefore buffered unless a caller asks otherwise.
+
+Summarize the log by query shape with:
+
+    python -m src.utility.query_profiler [--log slow_queries.log] [--top 10]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv('QUERY_PROFILE', '').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+LOG_PATH = os.getenv('QUERY_PROFILE_LOG',
+                     os.path.join(os.path.dirname(__file__), '..', '..', 'slow_queries.log'))
+MAX_PARAMS_LENGTH = 500
+EXPLAINABLE = ('select', 'update', 'delete')
+
+_slow_log = None
+
+
+def _get_slow_log():
+    """Logger writing one JSON object per line to the rotating slow query log"""
+    global _slow_log
+    if _slow_log is None:
+        _slow_log = logging.getLogger(f'{__name__}.slow')
+        _slow_log.propagate = False
+        _slow_log.setLevel(logging.INFO)
+        handler = RotatingFileHandler(LOG_PATH, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _slow_log.addHandler(handler)
+    return _slow_log
+
+
+def query_shape(sql):
+    """SQL with literals and placeholder lists collapsed, so variants of one query group together"""
+    shape = re.sub(r"'(?:[^'\\]|\\.)*'", '?', sql)
+    shape = re.sub(r'\b\d+(?:\.\d+)?\b', '?', shape)
+    shape = re.sub(r'%s|\?', '?', shape)
+    shape = re.sub(r'\?(?:\s*,\s*\?)+', '?, ...', shape)
+    shape = re.sub(r'\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+', '(?, ...), ...', shape)
+    return ' '.join(shape.split())
+
+
+def _short(params):
+    text = repr(params)
+    return text if len(text) <= MAX_PARAMS_LENGTH else text[:MAX_PARAMS_LENGTH] + '...'
+
+
+def _buffered(connection):
+    """Cursor arguments for a buffered cursor on connection"""
+    # Only mysql.connector has unbuffered cursors (and unread_result); PyMySQL's are buffered
+    return {'buffered': True} if hasattr(connection, 'unread_result') else {}
+
+
+class ProfiledCursor:
+    """Cursor wrapper that times execute and executemany"""
+
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(*self._args(sql, params))
+        finally:
+            self._record(sql, params, started, many=False)
+
+    def executemany(self, sql, seq_params):
+        seq_params = list(seq_params)
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_params)
+        finally:
+            self._record(sql, seq_params[:1], started, many=len(seq_params))
+
+    @staticmethod
+    def _args(sql, params):
+        return (sql,) if params is None else (sql, params)
+
+    def _record(self, sql, params, started, many):
+        duration_ms = (time.perf_counter() - started) * 1000
+        rows = getattr(self._cursor, 'rowcount', -1)
+        logger.debug(f"{duration_ms:.1f} ms, {rows} rows: {' '.join(sql.split())[:200]} {_short(params)}")
+        if duration_ms < SLOW_QUERY_MS:
+            return
+
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'route': request.path if has_request_context() else None,
+            'duration_ms': round(duration_ms, 2),
+            'rows': rows,
+            'shape': query_shape(sql),
+            'sql': sql,
+            'params': _short(params),
+        }
+        if many:
+            entry['batch_size'] = many
+        elif sql.lstrip().lower().startswith(EXPLAINABLE):
+            entry['plan'] = self._explain(sql, params)
+        _get_slow_log().info(json.dumps(entry, default=str))
+
+    def _explain(self, sql, params):
+        """EXPLAIN FORMAT=JSON for a statement, on a separate cursor so results are untouched"""
+        if getattr(self._connection, 'unread_result', False):
+            # An unbuffered cursor still holds the statement's rows
+            return {'error': "skipped: the statement's result has not been read yet"}
+        cursor = self._connection.cursor(**_buffered(self._connection))
+        try:
+            cursor.execute(*self._args(f"EXPLAIN FORMAT=JSON {sql}", params))
+            return json.loads(cursor.fetchone()[0])
+        except Exception as e:
+            return {'error': str(e)}
+        finally:
+            cursor.close()
+
+
+class ProfiledConnection:
+    """Connection wrapper whose cursors are profiled"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._connection.__exit__(*exc)
+
+    def cursor(self, *args, **kwargs):
+        if not args and not kwargs.get('prepared') and 'buffered' not in kwargs:
+            kwargs.update(_buffered(self._connection))
+        return ProfiledCursor(self._connection, self._connection.cursor(*args, **kwargs))
+
+
+def profile_connection(connection):
+    """Wrap connection for profiling when QUERY_PROFILE is set, else return it unchanged"""
+    if not ENABLED or connection is None:
+        return connection
+    return ProfiledConnection(connection)
+
+
+def full_scans(plan):
+    """Tables read with a full scan (access_type ALL) anywhere in an EXPLAIN plan"""
+    tables = []
+    if isinstance(plan, dict):
+        if plan.get('access_type') == 'ALL' and 'table_name' in plan:
+            tables.append(plan['table_name'])
+        for value in plan.values():
+            tables.extend(full_scans(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            tables.extend(full_scans(value))
+    return tables
+
+
+def summarize(paths, top=10):
+    """Aggregate slow query log entries by shape, worst total time first"""
+    shapes = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'full_scans': set(), 'sample': None})
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                shape = shapes[entry['shape']]
+                shape['count'] += 1
+                shape['total_ms'] += entry['duration_ms']
+                if entry['duration_ms'] >= shape['max_ms']:
+                    shape['max_ms'] = entry['duration_ms']
+                    shape['sample'] = entry
+                shape['full_scans'].update(full_scans(entry.get('plan')))
+    return sorted(shapes.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the slow query log by query shape")
+    parser.add_argument('--log', default=LOG_PATH, help="slow query log; rotated files are read too")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    paths = [p for p in [args.log] + [f'{args.log}.{n}' for n in range(1, 6)] if os.path.exists(p)]
+    if not paths:
+        print(f"No slow query log at {args.log}")
+        return
+
+    for rank, (shape, stats) in enumerate(summarize(paths, args.top), 1):
+        print(f"#{rank}  {stats['count']} queries, total {stats['total_ms']:.0f} ms, "
+              f"mean {stats['total_ms'] / stats['count']:.1f} ms, max {stats['max_ms']:.1f} ms")
+        print(f"    {shape[:300]}")
+        if stats['full_scans']:
+            print(f"    full table scans: {', '.join(sorted(stats['full_scans']))}")
+        sample = stats['sample']
+        print(f"    slowest: {sample['time']} {sample.get('route') or ''} params {sample['params'][:120]}")
+
+
+if __name__ == '__main__':
+    main()
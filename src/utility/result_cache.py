@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from .admission import admit, single_flight
+from .catalog import add_reload_listener, normalize_genre
+from .shared_cache import SHARED_CACHE_PATH, SharedResultCache
+
+
+def canonical_weights(weights):
+    """Sorted (normalized genre, weight) pairs of a weighted search"""
+    # The first weight given for a genre wins, so drop later repeats before sorting
+    first_weights = {}
+    for genre, weight in weights:
+        first_weights.setdefault(normalize_genre(genre), float(weight))
+    return sorted(first_weights.items())
+
+
+def canonical_band_genres(genres):
+    """Sorted distinct normalized genres of a band search"""
+    return sorted({normalize_genre(g) for g in genres})
+
+
+def weighted_query_key(weights, total_requested, filters=None):
+    """Canonical cache key for a weighted genre search"""
+    return _hash_query('weighted', canonical_weights(weights), total_requested, filters)
+
+
+def band_query_key(genres, total_requested, filters=None):
+    """Canonical cache key for a band genre-match search"""
+    return _hash_query('bands', canonical_band_genres(genres), total_requested, filters)
+
+
+def _hash_query(mode, genres, total_requested, filters=None):
+    query = [mode, genres, int(total_requested)]
+    # Unfiltered searches keep their original keys
+    if filters:
+        query.append(filters)
+    canonical = json.dumps(query, separators=(',', ':'), sort_keys=True)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """LRU cache of ranked results with a TTL and a memory budget.
+
+    Values are (rows, scores) numpy arrays as returned by the catalog's
+    ranking methods, so a page request is just a slice of a cached entry.
+    """
+
+    def __init__(self, max_entries=1000, ttl=600.0, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = sum(array.nbytes for array in value)
+        if size > self.max_bytes:
+            return
+        # Entries are shared between requests, so guard them against mutation
+        for array in value:
+            array.flags.writeable = False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def retain_version(self, version):
+        """Drop entries computed against any other catalog version"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] != version]:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+_cache = ResultCache(
+    max_entries=int(os.getenv('RESULT_CACHE_SIZE', 1000)),
+    ttl=float(os.getenv('RESULT_CACHE_TTL', 600)),
+    max_bytes=int(os.getenv('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+)
+
+_shared = SharedResultCache(
+    SHARED_CACHE_PATH,
+    ttl=float(os.getenv('SHARED_CACHE_TTL', 3600)),
+    max_entries=int(os.getenv('SHARED_CACHE_SIZE', 10000))
+) if SHARED_CACHE_PATH else None
+
+def _retain_version(catalog):
+    _cache.retain_version(catalog.version)
+    if _shared is not None and catalog.version is not None:
+        _shared.retain_version(catalog.version)
+
+# Rankings hold catalog row positions, so they die with the catalog they came from
+add_reload_listener(_retain_version)
+
+def get_result_cache():
+    return _cache
+
+def get_shared_cache_stats():
+    """Counters for the shared cache tier, empty when it is turned off"""
+    return _shared.stats() if _shared is not None else {}
+
+def _load_ranked(catalog, key, rank):
+    shared = _shared if catalog.version is not None else None
+    result = shared.get(catalog, key[1]) if shared is not None else None
+    if result is None:
+        result = admit(rank)
+        if shared is not None:
+            shared.put(catalog, key[1], result)
+    _cache.put(key, result)
+    return result
+
+def get_ranked(catalog, query_key, rank):
+    """Return the cached ranking of query_key on catalog, computing it with rank() on a miss.
+
+    This worker's cache is checked first, then the cache shared by all
+    workers. A catalog without a version never uses the shared tier.
+    Concurrent misses on one query share a single computation, and
+    rank() runs under admission control, so it may raise Overloaded.
+    """
+    key = (catalog.version, query_key)
+    result = _cache.get(key)
+    if result is None:
+        result = single_flight(key, lambda: _load_ranked(catalog, key, rank))
+    return result
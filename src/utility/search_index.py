@@ -0,0 +1,108 @@
+"""Prefix index for artist, title and album typeahead.
+
+Every distinct artist, album and title is folded (accents stripped,
+casefolded, whitespace collapsed) and indexed once per word start, so
+"zep" finds "Led Zeppelin". The keys are kept sorted, and a query is two
+bisections into them followed by a vectorized top-N over the weights of
+the matching range.
+
+A weight favours values with more songs and matches at the first word.
+"""
+import unicodedata
+from bisect import bisect_left
+import numpy as np
+
+ARTIST, TITLE, ALBUM = 0, 1, 2
+KINDS = ('artist', 'title', 'album')
+# Sorts after every character a folded key can contain
+_KEY_END = '\U0010ffff'
+
+
+def fold(text):
+    """Search key form of text: accents stripped, casefolded, single spaces"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def _word_starts(folded):
+    """The folded value from each word start onwards"""
+    starts = [0] + [i + 1 for i, c in enumerate(folded) if c == ' ']
+    return [folded[i:] for i in starts]
+
+
+def build_search_index(titles, artists, albums):
+    """Sorted search keys with kind, representative song row and weight arrays"""
+    entries = []
+    for kind, values in ((ARTIST, artists), (ALBUM, albums)):
+        # Values that fold alike (e.g. with and without accents) share an entry
+        groups = {}
+        for row, value in enumerate(values):
+            folded = fold(value)
+            if folded:
+                group = groups.setdefault(folded, [0, row])
+                group[0] += 1
+        for folded, (count, row) in groups.items():
+            for i, key in enumerate(_word_starts(folded)):
+                entries.append((key, kind, row, count * 2 + (i == 0)))
+    for row, title in enumerate(titles):
+        for i, key in enumerate(_word_starts(fold(title))):
+            entries.append((key, TITLE, row, 2 + (i == 0)))
+
+    entries.sort()
+    return {
+        'search_keys': [entry[0] for entry in entries],
+        'search_kinds': np.array([entry[1] for entry in entries], dtype=np.uint8),
+        'search_rows': np.array([entry[2] for entry in entries], dtype=np.int32),
+        'search_weights': np.array([entry[3] for entry in entries], dtype=np.int32),
+    }
+
+
+def search(catalog, query, limit=10, kinds=None):
+    """Ranked completions of query as (kind, song row, weight), best first.
+
+    kinds optionally restricts results to some of ARTIST, TITLE and ALBUM.
+    """
+    prefix = fold(query)
+    if not prefix:
+        return []
+    lo = bisect_left(catalog.search_keys, prefix)
+    hi = bisect_left(catalog.search_keys, prefix + _KEY_END, lo)
+    if lo == hi or limit <= 0:
+        return []
+
+    weights = catalog.search_weights[lo:hi]
+    if kinds is not None:
+        weights = np.where(np.isin(catalog.search_kinds[lo:hi], list(kinds)), weights, -1)
+
+    # A value can match at several word starts, so take spare candidates and
+    # widen the selection until enough distinct values turn up
+    wanted = limit * 2
+    while True:
+        wanted = min(wanted, len(weights))
+        results = _distinct_best(catalog, lo, weights, wanted, limit)
+        if len(results) == limit or wanted == len(weights):
+            return results
+        wanted *= 2
+
+
+def _distinct_best(catalog, lo, weights, wanted, limit):
+    """Up to limit distinct (kind, row, weight) among the wanted best weights"""
+    kth = np.partition(weights, len(weights) - wanted)[len(weights) - wanted]
+    above = np.flatnonzero(weights > kth)
+    candidates = np.concatenate([above, np.flatnonzero(weights == kth)[:wanted - len(above)]])
+    # Ties go to the earliest key, i.e. the closest completion
+    candidates = candidates[np.lexsort((candidates, -weights[candidates]))]
+
+    results = []
+    seen = set()
+    for i in candidates:
+        if weights[i] < 0 or len(results) == limit:
+            break
+        entry = (int(catalog.search_kinds[lo + i]), int(catalog.search_rows[lo + i]))
+        if entry not in seen:
+            seen.add(entry)
+            results.append(entry + (int(weights[i]),))
+    return results
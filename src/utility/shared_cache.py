@@ -0,0 +1,156 @@
+"""Result cache tier shared by all workers on the host.
+
+Rankings are stored in an SQLite database in WAL mode, so any number of
+worker processes can read while one writes. It sits behind each worker's
+in-memory ResultCache: a ranking computed by one worker is a lookup for
+the others.
+
+An entry is keyed by (catalog version, query key) and holds the song ids
+and scores of the ranking as packed little-endian arrays (4-byte ids
+where they fit, 8-byte float scores). Song ids rather than row positions
+are stored, so an entry is checked against the catalog it is read into.
+Entries of other catalog versions are purged on reload and expire after
+SHARED_CACHE_TTL seconds; the table is trimmed to SHARED_CACHE_SIZE
+entries.
+
+Only catalogs opened from the snapshot share a version across workers,
+so a worker that loaded its catalog from MySQL effectively uses this tier
+on its own. Set SHARED_CACHE to an empty string to turn it off.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE',
+                              os.path.join(os.path.dirname(__file__), '..', '..', 'result_cache.sqlite3'))
+# Writes trim the table only every so often
+_PRUNE_EVERY = 100
+
+
+def encode_ranking(song_ids, scores):
+    """Packed (ids, scores) blobs of a ranking"""
+    id_type = '<i4' if not len(song_ids) or (song_ids.min() >= -2 ** 31 and song_ids.max() < 2 ** 31) else '<i8'
+    return song_ids.astype(id_type).tobytes(), scores.astype('<f8').tobytes()
+
+
+def decode_ranking(id_blob, score_blob):
+    """(song ids, scores) arrays of blobs written by encode_ranking"""
+    scores = np.frombuffer(score_blob, dtype='<f8').astype(np.float64)
+    id_type = '<i8' if len(id_blob) == 8 * len(scores) else '<i4'
+    return np.frombuffer(id_blob, dtype=id_type).astype(np.int64), scores
+
+
+class SharedResultCache:
+    """Rankings in an SQLite file every worker process can read and write"""
+
+    def __init__(self, path, ttl=3600.0, max_entries=10000, busy_timeout=2.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    def _connection(self):
+        """This thread's connection, reopened after a fork"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " catalog_version TEXT NOT NULL,"
+            " query_key TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " song_ids BLOB NOT NULL,"
+            " scores BLOB NOT NULL,"
+            " PRIMARY KEY (catalog_version, query_key)"
+            ") WITHOUT ROWID")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_results_created ON results (created)")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, catalog, query_key):
+        """(rows, scores) of query_key on catalog, None if it is not stored"""
+        try:
+            found = self._connection().execute(
+                "SELECT song_ids, scores FROM results"
+                " WHERE catalog_version = ? AND query_key = ? AND created >= ?",
+                (catalog.version, query_key, time.time() - self.ttl)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared result cache read failed: {e}")
+            self._count('errors')
+            return None
+        if found is not None:
+            song_ids, scores = decode_ranking(*found)
+            rows = np.searchsorted(catalog.song_ids, song_ids)
+            # Guard against an entry that does not belong to this catalog
+            if len(song_ids) == len(scores) and np.all(rows < len(catalog)) \
+                    and np.array_equal(catalog.song_ids[rows], song_ids):
+                self._count('hits')
+                return rows, scores
+        self._count('misses')
+        return None
+
+    def put(self, catalog, query_key, result):
+        """Store the (rows, scores) ranking of query_key on catalog"""
+        rows, scores = result
+        song_ids, score_blob = encode_ranking(catalog.song_ids[rows], scores)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO results (catalog_version, query_key, created, song_ids, scores)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (catalog.version, query_key, time.time(), song_ids, score_blob))
+            if prune:
+                self._prune(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared result cache write failed: {e}")
+            self._count('errors')
+            return
+        self._count('stores')
+
+    def _prune(self, connection):
+        """Drop expired entries and the oldest beyond max_entries"""
+        connection.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,))
+        connection.execute(
+            "DELETE FROM results WHERE created <= ("
+            " SELECT created FROM results ORDER BY created DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries,))
+
+    def retain_version(self, version):
+        """Drop entries computed against any other catalog version"""
+        try:
+            self._connection().execute("DELETE FROM results WHERE catalog_version != ?", (version,))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared result cache purge failed: {e}")
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'errors': self.errors,
+            }
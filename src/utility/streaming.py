@@ -0,0 +1,46 @@
+"""Streaming newline-delimited JSON responses."""
+import zlib
+from flask import current_app, request
+
+# Rows per flush after the first row, which is sent on its own
+STREAM_BATCH = 20
+
+
+def _chunks(fragments):
+    """Group fragments into NDJSON chunks: the first row alone, then STREAM_BATCH rows at a time"""
+    batch = []
+    limit = 1
+    for fragment in fragments:
+        batch.append(fragment)
+        if len(batch) >= limit:
+            yield b'\n'.join(batch) + b'\n'
+            batch = []
+            limit = STREAM_BATCH
+    if batch:
+        yield b'\n'.join(batch) + b'\n'
+
+
+def _gzip(chunks):
+    """Gzip a stream, flushing after every chunk so the client can decode it straight away"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def ndjson_response(fragments, total):
+    """Stream pre-encoded JSON rows, one per line, gzipped when the client accepts it.
+
+    fragments is consumed lazily, so memory use does not grow with the
+    number of rows. The row count is sent up front in X-Total-Count.
+    """
+    body = _chunks(fragments)
+    response = current_app.response_class(body, mimetype='application/x-ndjson')
+    if 'gzip' in request.accept_encodings:
+        response.response = _gzip(body)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Total-Count'] = str(total)
+    # Ask proxies in front of Passenger not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,101 @@
+"""Cache warm-up for new workers.
+
+Passenger starts workers on demand, and a fresh worker would otherwise
+serve its first requests with no catalog, no database connections and an
+empty result cache. start_warmup() runs in a background thread while the
+worker takes traffic: it loads the catalog, opens a pooled connection and
+ranks the most frequent recent queries of the query log into the result
+cache, under the same cache keys the endpoints use.
+
+WARMUP_QUERIES (default 50) sets how many queries are primed; 0 turns
+warm-up off.
+"""
+import logging
+import os
+import threading
+import time
+from .catalog import get_catalog
+from .database_connect import get_db_connection
+from .precomputed import rank_band_genres, rank_weighted
+from .query_log import popular_searches, read_query_log
+from .result_cache import band_query_key, get_ranked, weighted_query_key
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERIES = int(os.getenv('WARMUP_QUERIES', 50))
+# Only the end of the log is read, so warm-up follows recent traffic
+WARMUP_LOG_BYTES = int(os.getenv('WARMUP_LOG_BYTES', 4 * 1024 * 1024))
+
+_stats = {'running': 0, 'done': 0, 'seconds': 0.0, 'primed': 0, 'failed': 0}
+_started = False
+_start_lock = threading.Lock()
+
+
+def prime(catalog, search):
+    """Rank one (mode, genres, totalRequested, filters) search into the result cache"""
+    mode, genres, total_requested, filters = search
+    total_requested = max(0, min(total_requested, 500))
+    if mode == 'weighted':
+        query_key = weighted_query_key(genres, total_requested, filters)
+        get_ranked(catalog, query_key, lambda: rank_weighted(catalog, genres, total_requested, filters))
+    else:
+        query_key = band_query_key(genres, total_requested, filters)
+        get_ranked(catalog, query_key, lambda: rank_band_genres(catalog, genres, total_requested, filters))
+
+
+def warm_up(top=WARMUP_QUERIES):
+    """Load the catalog, open a pooled connection and prime the top queries; returns the stats"""
+    started = time.perf_counter()
+    _stats['running'] = 1
+    try:
+        catalog = get_catalog()
+
+        # The connection goes back to the pool idle, ready for the first request
+        try:
+            connection = get_db_connection()
+            if connection is not None:
+                connection.close()
+        except Exception as e:
+            logger.warning(f"Warm-up could not open a database connection: {e}")
+
+        if catalog is None:
+            logger.warning("Warm-up skipped: catalog unavailable")
+            return _stats
+
+        for search in popular_searches(read_query_log(tail_bytes=WARMUP_LOG_BYTES), top):
+            try:
+                prime(catalog, search)
+                _stats['primed'] += 1
+            except Exception as e:
+                _stats['failed'] += 1
+                logger.debug(f"Warm-up query failed: {e}")
+    finally:
+        _stats['seconds'] = round(time.perf_counter() - started, 3)
+        _stats['running'] = 0
+        _stats['done'] = 1
+    logger.info(f"Warm-up primed {_stats['primed']} cached queries in {_stats['seconds']:.2f}s")
+    return _stats
+
+
+def _run():
+    try:
+        warm_up()
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+
+
+def start_warmup():
+    """Warm this worker up in a daemon thread, once per process"""
+    global _started
+    if WARMUP_QUERIES <= 0:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_run, name='cache-warmup', daemon=True).start()
+
+
+def get_warmup_stats():
+    """Progress and outcome of this worker's warm-up"""
+    return dict(_stats)